@@ -0,0 +1,101 @@
+"""
+Concurrency benchmark of the API: p50/p99 latency of per-country calls at 50 to 500 concurrent clients,
+for the async app (src/api/api.py) against the previous sync handlers (db connection per request).
+    ECOACT_DB_PATH=ecoact.db python -m benchmarks.api_concurrency [--requests 2000] [--clients 50 100 250 500]
+"""
+import json
+import time
+import sqlite3
+import asyncio
+import logging
+import argparse
+import statistics
+from typing import Dict, List
+
+import httpx
+import pandas as pd
+from fastapi import FastAPI
+
+from src.api.api import app as async_app
+from src.api.api_db import pool
+from src.db.db_connection import get_db_path
+
+logging.basicConfig(level=logging.INFO)
+
+def legacy_app(db_path:str) -> FastAPI:
+    """
+    The previous per-country endpoint: sync handler, db connection per request, json.loads per row.
+    """
+    app = FastAPI()
+
+    @app.get("/world_elec_mix_emissions/{country_iso_3}")
+    def get_world_electricity_mix_emissions(country_iso_3: str):
+        db = sqlite3.connect(db_path)
+        try:
+            query = """SELECT json_object('Country', country_iso_3, 'Emissions', emissions, 'Date for', validity_date)
+                       FROM world_electricity_emissions
+                       WHERE country_iso_3=:country_iso_3
+                       """
+            result = db.execute(query, {"country_iso_3": country_iso_3}).fetchall()
+        finally:
+            db.close()
+        if result:
+            return [json.loads(d[0]) for d in result]
+
+    return app
+
+async def run_clients(app:FastAPI, urls:List[str], clients:int) -> List[float]:
+    """
+    Run all urls through `clients` concurrent clients, returning each request's latency (in ms).
+    """
+    latencies = []
+    queue: asyncio.Queue = asyncio.Queue()
+    for url in urls:
+        queue.put_nowait(url)
+
+    async def client(http:httpx.AsyncClient) -> None:
+        while not queue.empty():
+            url = queue.get_nowait()
+            start = time.perf_counter()
+            response = await http.get(url)
+            latencies.append((time.perf_counter() - start) * 1_000)
+            response.raise_for_status()
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url='http://benchmark') as http:
+        await asyncio.gather(*(client(http) for _ in range(clients)))
+
+    return latencies
+
+def country_urls(db_path:str, requests:int) -> List[str]:
+    db = sqlite3.connect(db_path)
+    try:
+        countries = [row[0] for row in db.execute("SELECT DISTINCT country_iso_3 FROM world_electricity_emissions")]
+    finally:
+        db.close()
+    return [f'/world_elec_mix_emissions/{countries[i % len(countries)]}' for i in range(requests)]
+
+def benchmark(requests:int, clients_levels:List[int]) -> List[Dict]:
+    db_path = get_db_path()
+    urls = country_urls(db_path, requests)
+    apps = {'sync (previous)': legacy_app(db_path), 'async': async_app}
+
+    results = []
+    for clients in clients_levels:
+        for name, app in apps.items():
+            latencies = asyncio.run(run_clients(app, urls, clients))
+            percentiles = statistics.quantiles(latencies, n=100)
+            results.append({'app': name, 'clients': clients, 'requests': len(latencies),
+                            'p50_ms': round(percentiles[49], 2), 'p99_ms': round(percentiles[98], 2)})
+    pool.close()
+
+    return results
+
+if __name__=="__main__":
+    parser = argparse.ArgumentParser(description='API latency under concurrent clients, async vs previous sync handlers.')
+    parser.add_argument('--requests', type=int, default=2_000, help='Requests per run.')
+    parser.add_argument('--clients', type=int, nargs='+', default=[50, 100, 250, 500], help='Concurrent clients per run.')
+    args = parser.parse_args()
+
+    report = pd.DataFrame(benchmark(args.requests, args.clients))
+    logging.info(f'API latency under concurrent clients:\n{report.to_string(index=False)}')
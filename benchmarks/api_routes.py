@@ -0,0 +1,62 @@
+"""
+API benchmarks: every GET route of src/api/api.py, called through a local TestClient,
+with the response cache cleared before each call (i.e. served by sqlite), and served from the response cache,
+and a dashboard's per-country fan-out (to compare with the batch route).
+The app's read pool opens the db set at import, so this is imported once the benchmark db is built (see run.py).
+"""
+import logging
+from typing import Dict, List
+
+from fastapi.routing import APIRoute
+from fastapi.testclient import TestClient
+
+from src.api.api import app, cache
+from benchmarks.bench_utils import Result, measure
+
+# Path parameters of the routes, e.g. /world_elec_mix_emissions/{country_iso_3}
+PATH_PARAMS: Dict[str, str] = {
+    'country_iso_3': 'FRA',
+    'dept_id': '75',
+}
+# Countries of a dashboard's fan-out, and of the batch route
+FANOUT_COUNTRIES = ['FRA', 'DEU', 'ITA', 'ESP', 'GBR', 'BEL', 'NLD', 'CHE', 'AUT', 'POL', 'USA', 'CAN', 'MEX', 'BRA',
+                    'ARG', 'CHN', 'JPN', 'KOR', 'IND', 'IDN', 'AUS', 'NZL', 'ZAF', 'EGY', 'MAR', 'NGA', 'KEN', 'TUR',
+                    'RUS', 'UKR', 'SWE', 'NOR', 'FIN', 'DNK', 'IRL', 'PRT', 'GRC', 'CZE', 'HUN', 'ROU']
+# Required query parameters of the routes
+QUERY_PARAMS: Dict[str, str] = {
+    '/batch/world_elec_mix_emissions': f"countries={','.join(FANOUT_COUNTRIES)}",
+    '/batch/fr_regional_heating_emissions': 'depts=01,13,2A,33,59,69,75',
+}
+
+def route_urls() -> List[str]:
+    urls = []
+    for route in app.routes:
+        if isinstance(route, APIRoute) and 'GET' in route.methods:
+            url = route.path.format(**PATH_PARAMS)
+            urls.append(f'{url}?{QUERY_PARAMS[url]}' if url in QUERY_PARAMS else url)
+    return urls
+
+def run(repeat:int=5) -> List[Result]:
+    results = []
+    with TestClient(app) as client:
+        for url in route_urls():
+            def get(_=None, url=url) -> None:
+                client.get(url).raise_for_status()
+
+            try:
+                get()
+            except Exception as e:
+                logging.warning(f'Skipped benchmark of GET {url}: {e}')
+                continue
+            path = url.split('?')[0]
+            results.append(measure(f'api/uncached/GET {path}', get, setup=cache.clear, repeat=repeat))
+            results.append(measure(f'api/cached/GET {path}', get, repeat=repeat))
+
+        # Dashboard fan-out, as one call per country, against a single batch call
+        def fanout(_) -> None:
+            for country in FANOUT_COUNTRIES:
+                client.get(f'/world_elec_mix_emissions/{country}').raise_for_status()
+
+        results.append(measure(f'api/uncached/fan-out of {len(FANOUT_COUNTRIES)} countries', fanout, setup=cache.clear, repeat=repeat))
+
+    return results
@@ -0,0 +1,73 @@
+"""
+This file contains the benchmarks' timing & baselines: each benchmark is run `repeat` times (after a fresh setup,
+not timed), and its median time compared to the stored baseline of the same export size
+(benchmarks/baselines/<rows>.json), a regression being a median slower than baseline * (1 + tolerance).
+Baselines are machine specific: save them (run.py --save-baseline) on the machine the benchmarks are compared on.
+"""
+import json
+import time
+import statistics
+import logging
+from pathlib import Path
+from typing import Any, Callable, Dict, List, NamedTuple
+
+logging.basicConfig(level=logging.INFO)
+
+BASELINE_DIR = Path(__file__).resolve().parent / 'baselines'
+
+class Result(NamedTuple):
+    name: str       # e.g. 'ingest/fr_regional_heating_emissions/clean', 'api/uncached/GET /summary/fr_forestry_area'
+    median_s: float
+    min_s: float
+    runs: int
+
+def measure(name:str, func:Callable[[Any], Any], setup:Callable[[], Any]=None, repeat:int=5) -> Result:
+    """
+    Time func(setup()) `repeat` times, setup being run before each (untimed), e.g. to copy its input.
+    Without setup, func is called without arguments.
+    """
+    times = []
+    for _ in range(repeat):
+        args = (setup(),) if setup is not None else ()
+        start = time.perf_counter()
+        func(*args)
+        times.append(time.perf_counter() - start)
+
+    return Result(name, statistics.median(times), min(times), repeat)
+
+def baseline_path(rows:int) -> Path:
+    return BASELINE_DIR / f'{rows}.json'
+
+def load_baseline(rows:int) -> Dict[str, float]:
+    try:
+        with open(baseline_path(rows)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+def save_baseline(rows:int, results:List[Result]) -> None:
+    path = baseline_path(rows)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump({result.name: round(result.median_s, 6) for result in results}, f, indent=2)
+    logging.info(f'Saved {len(results)} baseline timings to {path}.')
+
+def compare(results:List[Result], baseline:Dict[str, float], tolerance:float) -> List[Dict[str, Any]]:
+    """
+    Compare median timings to the baseline's.
+    -----------
+    returns:
+        one row per benchmark (name, median_ms, baseline_ms, ratio, regression)
+    """
+    rows = []
+    for result in results:
+        baseline_s = baseline.get(result.name)
+        ratio = result.median_s / baseline_s if baseline_s else None
+        rows.append({
+            'name': result.name,
+            'median_ms': round(result.median_s * 1_000, 2),
+            'baseline_ms': round(baseline_s * 1_000, 2) if baseline_s else None,
+            'ratio': round(ratio, 2) if ratio else None,
+            'regression': ratio is not None and ratio > 1 + tolerance,
+        })
+    return rows
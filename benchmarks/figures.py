@@ -0,0 +1,37 @@
+"""
+Figure benchmarks: every figure builder of src/app_utils/figs.py (as called by app.py on each rerun),
+built from the db with all data & figure caches cleared, and served from these caches.
+Skipped if plotly isn't installed.
+"""
+import logging
+from typing import Callable, Dict, List
+
+from benchmarks.bench_utils import Result, measure
+
+# Selections of the forestry figure, as offered by app.py
+FOREST_TYPES = ['Open forest', 'Closed forest', 'Open and closed forest', 'Total']
+TREE_TYPES = ['Deciduous', 'Coniferous', 'Mixed', 'Total']
+
+def run(repeat:int=5) -> List[Result]:
+    try:
+        from src.app_utils import figs
+        from src.app_utils.figs_data import clear_caches
+    except ImportError as e:
+        logging.warning(f'Skipped figure benchmarks: {e}')
+        return []
+
+    builders: Dict[str, Callable[[], object]] = {
+        'graph_world_electricity_emissions': figs.graph_world_electricity_emissions,
+        'graph_fr_heating_emissions': figs.graph_fr_heating_emissions,
+        'graph_fr_forestry_change': lambda: figs.graph_fr_forestry_change('Closed forest', 'Total'),
+        # Every selection in turn, as when browsing them in the app
+        'graph_fr_forestry_change/all_selections': lambda: [figs.graph_fr_forestry_change(forest_type, tree_type)
+                                                            for forest_type in FOREST_TYPES for tree_type in TREE_TYPES],
+    }
+
+    results = []
+    for name, builder in builders.items():
+        results.append(measure(f'figs/uncached/{name}', lambda _, builder=builder: builder(), setup=clear_caches, repeat=repeat))
+        results.append(measure(f'figs/cached/{name}', builder, repeat=repeat))
+
+    return results
@@ -0,0 +1,99 @@
+"""
+Equivalence check & benchmark of the vectorized heating cleaner (clean_fr_regional_heating_emissions_data)
+against the previous row-wise one (apply(axis=1) imputation, per-row string applies & regex region renaming), kept below as reference.
+Both are run on the heating rows of a synthetic export (see synthetic_data.py). The outputs must be identical
+with the previous imputation groups (per dept only); the default groups (per dept & validity year) are timed too.
+    python -m benchmarks.heating_clean [--rows 100000] [--repeat 5]
+"""
+import argparse
+import logging
+import tempfile
+from pathlib import Path
+
+import pandas as pd
+
+from src.utils.cleaning_utils import clean_FR_dates
+from src.utils.source_utils import read_source
+from src.dataset_func.fr_regional_heating_emissions_data import (CATEGORY, clean_fr_regional_heating_emissions_data,
+                                                                 retrieve_fr_regional_heating_emissions_data)
+from benchmarks.bench_utils import measure
+from benchmarks.synthetic_data import generate_export
+
+logging.basicConfig(level=logging.INFO)
+
+def previous_update_FR_region_names(data:pd.Series) -> pd.Series:
+    region_name_map = {
+        "Alsace" : "Grand Est",
+        "Champagne-Ardenne" : "Grand Est",
+        "Lorraine": "Grand Est",
+        "Aquitaine": "Aquitaine-Limousin-Poitou-Charentes",
+        "Limousin": "Aquitaine-Limousin-Poitou-Charentes",
+        "Poitou-Charentes": "Aquitaine-Limousin-Poitou-Charentes",
+        "Auvergne": "Auvergne-Rhône-Alpes",
+        "Rhône-Alpes": "Auvergne-Rhône-Alpes",
+        "Bourgogne" : "Bourgogne-Franche-Comté Dijon",
+        "Franche-Comté": "Bourgogne-Franche-Comté Dijon",
+        "Centre-Val de Loire": "Centre",
+        "Languedoc-Roussillon": "Occitanie",
+        "Midi-Pyrénées":"Occitanie",
+        "Midi-Pyrenées":"Occitanie",
+        "Nord-Pas-de-Calais": "Hauts de France",
+        "Picardie":"Hauts de France",
+        "Basse-Normandie": "Normandie",
+        "Haute-Normandie": "Normandie",
+    }
+    data.replace(region_name_map, regex=True, inplace=True)
+    return data.str.strip()
+
+def previous_clean_fr_regional_heating_emissions_data(data:pd.DataFrame) -> pd.DataFrame:
+    clean_df = pd.DataFrame()
+    clean_df['element_id'] = data["Identifiant de l'élément"]
+    clean_df['country'] = data['Localisation géographique'].apply(lambda x: x.split()[0])
+    data.loc[data["Sous-localisation géographique français"].isna(), "Sous-localisation géographique français"] = 'Corse, Corte'
+    clean_df['region'] = data['Sous-localisation géographique français'].apply(lambda x: x.split(',')[0])
+    clean_df['region'] = previous_update_FR_region_names(clean_df['region'])
+    clean_df[['dept_id', 'city', 'address', 'address2']] = data['Nom attribut français'].str.split(', ', expand=True)
+    clean_df['dept_id'] = clean_df['dept_id'].str.zfill(2)
+    clean_df['address'] = clean_df['address'].str.cat(clean_df['address2'], sep=' ', na_rep='')
+    clean_df.drop(columns={'address2'}, inplace=True)
+    clean_df['heat_cycle'] = data['Nom base français'].apply(lambda x: 'heat' if 'chaleur' in x else 'cool')
+    clean_df['creation_date'] = clean_FR_dates(data['Date de création'], input_format='%B %Y')
+    clean_df['modified_date'] = clean_FR_dates(data['Date de modification'], input_format='%B %Y')
+    clean_df['validity_date'] = pd.to_datetime(data['Période de validité'].apply(lambda x: x.replace('Année ', '')), format='%Y')
+    clean_df['archived'] = data["Statut de l'élément"].apply(lambda x: True if x=='Archivé' else False)
+    clean_df['emissions'] = data['Total poste non décomposé']
+    dept_mean_emissions = clean_df[clean_df['emissions'] != 0].groupby('dept_id')['emissions'].mean()
+    clean_df['emissions'] = clean_df.apply(lambda x: dept_mean_emissions[x['dept_id']] if x['emissions'] == 0 else x['emissions'], axis=1)
+    clean_df['uncertainty'] = data['Incertitude']
+    clean_df['unit_name'] = data['Unité français']
+    clean_df['source_name'] = data['Source']
+    return clean_df
+
+def run(rows:int, repeat:int) -> pd.DataFrame:
+    with tempfile.TemporaryDirectory(prefix='ecoact_bench_heating_') as workdir:
+        path = generate_export(rows, Path(workdir) / 'export.csv')
+        data = retrieve_fr_regional_heating_emissions_data(read_source([CATEGORY], path).partitions[CATEGORY])
+
+    previous = previous_clean_fr_regional_heating_emissions_data(data.copy())
+    vectorized = clean_fr_regional_heating_emissions_data(data.copy(), imputation_keys=['dept_id'])
+    pd.testing.assert_frame_equal(vectorized, previous, check_dtype=False)
+    logging.info(f'Vectorized & previous cleaners are equivalent on {len(data)} heating rows.')
+
+    results = [
+        measure('previous (apply, per dept)', previous_clean_fr_regional_heating_emissions_data, setup=data.copy, repeat=repeat),
+        measure('vectorized (per dept)', lambda data: clean_fr_regional_heating_emissions_data(data, ['dept_id']),
+                setup=data.copy, repeat=repeat),
+        measure('vectorized (per dept & year)', clean_fr_regional_heating_emissions_data, setup=data.copy, repeat=repeat),
+    ]
+    report = pd.DataFrame(results)
+    report['speedup'] = (report['median_s'].iloc[0] / report['median_s']).round(1)
+
+    return report
+
+if __name__=="__main__":
+    parser = argparse.ArgumentParser(description='Compare the vectorized heating cleaner to the previous one.')
+    parser.add_argument('--rows', type=int, default=100_000, help='Rows of the synthetic export (~5%% heating rows).')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    logging.info(f'Heating cleaners:\n{run(args.rows, args.repeat).to_string(index=False)}')
@@ -0,0 +1,77 @@
+"""
+Ingest benchmarks: reading the source export (parsed & cached), create_db, the dimensions' upload_data
+(init_db_dim_data), each dataset's retrieve / clean / prep stages, its upsert (+ aggregates refresh)
+into an empty db and as an unchanged re-import, and the whole ingest (emissions.main).
+Run from a working dir holding data/ (see run.py), each db being a new file of that dir.
+"""
+import itertools
+from pathlib import Path
+from typing import List
+
+from emissions import DATASETS, main, store
+from src.db.db_setup import create_db, init_db_dim_data, retrieve_db_dim_data
+from src.db.db_connection import set_db_path
+from src.utils.source_utils import load_source, read_source
+from src.utils.profiling_utils import PipelineProfiler
+from benchmarks.bench_utils import Result, measure
+
+def run(workdir:Path, repeat:int=5) -> List[Result]:
+    """
+    returns:
+        timings, the last db being left with all datasets imported (e.g. for the API & figures benchmarks)
+    """
+    results = []
+    db_paths = (Path(workdir) / f'bench_{i}.db' for i in itertools.count())
+    categories = [dataset.category for dataset in DATASETS]
+
+    results.append(measure('ingest/source/read', lambda: read_source(categories), repeat=repeat))
+    cache_dir = Path(workdir) / '.cache' / 'source'
+    source = load_source(categories, cache_dir=cache_dir) # Cached once, then loaded from the cache
+    results.append(measure('ingest/source/read_cached', lambda: load_source(categories, cache_dir=cache_dir), repeat=repeat))
+
+    def new_db() -> None:
+        set_db_path(next(db_paths))
+
+    def new_db_with_dims() -> None:
+        new_db()
+        create_db()
+        init_db_dim_data(source.units, source.sources)
+
+    results.append(measure('ingest/db/create_db', lambda _: create_db(), setup=new_db, repeat=repeat))
+    results.append(measure('ingest/db/init_db_dim_data', lambda _: init_db_dim_data(source.units, source.sources),
+                           setup=lambda: (new_db(), create_db()), repeat=repeat))
+
+    # Stages run on the inputs of the previous stage, copied before each run (untimed)
+    new_db_with_dims()
+    db_dims = retrieve_db_dim_data()
+    prepped = {}
+    for dataset in DATASETS:
+        data = source.partitions[dataset.category]
+        for stage, func in [('retrieve', dataset.retrieve),
+                            ('clean', dataset.clean),
+                            ('prep', lambda data, prep=dataset.prep: prep(data, db_dims))]:
+            results.append(measure(f'ingest/{dataset.name}/{stage}', func, setup=data.copy, repeat=repeat))
+            data = func(data.copy())
+        prepped[dataset.name] = data
+
+    for dataset in DATASETS:
+        data = prepped[dataset.name]
+        results.append(measure(f'ingest/{dataset.name}/upsert_new', lambda data: store(dataset, data, PipelineProfiler()),
+                               setup=lambda: (new_db_with_dims(), data.copy())[1], repeat=repeat))
+
+    # Unchanged re-import, on a db holding all datasets
+    new_db_with_dims()
+    for dataset in DATASETS:
+        store(dataset, prepped[dataset.name].copy(), PipelineProfiler())
+    for dataset in DATASETS:
+        data = prepped[dataset.name]
+        results.append(measure(f'ingest/{dataset.name}/upsert_unchanged', lambda data: store(dataset, data, PipelineProfiler()),
+                               setup=data.copy, repeat=repeat))
+
+    def new_db_created() -> None:
+        new_db()
+        create_db()
+
+    results.append(measure('ingest/main', lambda _: main(cache_dir=None), setup=new_db_created, repeat=repeat))
+
+    return results
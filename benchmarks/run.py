@@ -0,0 +1,75 @@
+"""
+Benchmark suite of the ingest, API & app figures, on synthetic Base Carbone exports (see synthetic_data.py),
+compared to the stored baselines of each export size (see bench_utils.py):
+    python -m benchmarks.run [--rows 10000] [--repeat 5] [--tolerance 0.25] [--save-baseline]
+i.e. one export size (e.g. 10000, 100000, 1000000 or 10000000 rows) per process, as the API's read pool opens a single db.
+The suite is run in a temporary working dir (data/ & maps/ copied from the repo, and the generated export).
+Exits with 1 if any benchmark regressed beyond the tolerance, or has no baseline (baselines are machine specific,
+so are stored with --save-baseline on the machine compared, before any change).
+"""
+import os
+import sys
+import shutil
+import argparse
+import logging
+import tempfile
+from pathlib import Path
+from typing import List
+
+import pandas as pd
+
+from src.utils.source_utils import SOURCE_FILE
+from benchmarks import ingest
+from benchmarks.bench_utils import Result, compare, load_baseline, save_baseline
+from benchmarks.synthetic_data import generate_export
+
+logging.basicConfig(level=logging.INFO)
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+
+def run_suite(rows:int, repeat:int, workdir:Path) -> List[Result]:
+    for dir_name in ('data', 'maps'):
+        shutil.copytree(REPO_DIR / dir_name, workdir / dir_name, dirs_exist_ok=True)
+    generate_export(rows, workdir / SOURCE_FILE)
+
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    # Only report the benchmarks (stages log at INFO level)
+    log_level = logging.getLogger().level
+    logging.getLogger().setLevel(logging.WARNING)
+    try:
+        results = ingest.run(workdir, repeat)
+        # Imported once the db with all datasets is left by the ingest benchmarks, as the API's read pool opens it on import
+        from benchmarks import api_routes, figures
+        results += api_routes.run(repeat)
+        results += figures.run(repeat)
+    finally:
+        logging.getLogger().setLevel(log_level)
+        os.chdir(cwd)
+
+    return results
+
+if __name__=="__main__":
+    parser = argparse.ArgumentParser(description='Benchmark the ingest, API & figures on synthetic exports.')
+    parser.add_argument('--rows', type=int, default=10_000, help='Rows of the synthetic export, e.g. 10000 to 10000000.')
+    parser.add_argument('--repeat', type=int, default=5, help='Runs of each benchmark (median reported).')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='Slowdown over the baseline reported as a regression.')
+    parser.add_argument('--save-baseline', action='store_true', help='Store these timings as the baselines.')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix=f'ecoact_bench_{args.rows}_') as workdir:
+        results = run_suite(args.rows, args.repeat, Path(workdir))
+
+    report = pd.DataFrame(compare(results, load_baseline(args.rows), args.tolerance))
+    logging.info(f'Benchmarks of {args.rows} rows:\n{report.to_string(index=False)}')
+
+    if args.save_baseline:
+        save_baseline(args.rows, results)
+    elif report['baseline_ms'].isna().any():
+        missing = report.loc[report['baseline_ms'].isna(), 'name'].tolist()
+        logging.error(f"No baseline of {args.rows} rows for {len(missing)} benchmarks (e.g. {', '.join(missing[:3])}): "
+                      f"store the baselines first with --save-baseline.")
+        sys.exit(1)
+    elif report['regression'].any():
+        logging.error(f"{report['regression'].sum()} benchmarks regressed beyond the tolerance ({args.tolerance:.0%}).")
+        sys.exit(1)
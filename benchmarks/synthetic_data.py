@@ -0,0 +1,196 @@
+"""
+Synthetic Base Carbone exports, with the columns, encoding (latin-1) and value formats of
+data/donnees_candidats_dev_python.csv: category paths, french month dates ('Février 2019', 'déc.-19'),
+accented text, and dimension cardinalities (departments, regions & countries from data/, ~40 units, ~200 sources).
+Rows of the imported datasets (see emissions.DATASETS) make up SHARES of the export, the rest being other categories.
+    python -m benchmarks.synthetic_data --rows 100000 [--out data/donnees_candidats_dev_python.csv] [--seed 0]
+"""
+import argparse
+import logging
+from pathlib import Path
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+
+from src.utils.source_utils import SOURCE_ENCODING
+
+logging.basicConfig(level=logging.INFO)
+
+DATA_DIR = Path(__file__).resolve().parent.parent / 'data'
+
+COLUMNS = ["Type Ligne", "Identifiant de l'élément", "Structure", "Statut de l'élément", "Code de la catégorie",
+           "Programme", "Url du programme", "Transparence", "Qualité", "Qualité TeR", "Qualité GR", "Qualité TiR",
+           "Qualité C", "Qualité P", "Qualité M", "Localisation géographique", "Sous-localisation géographique français",
+           "Période de validité", "Type poste", "Unité français", "Total poste non décomposé", "Source", "Incertitude",
+           "Date de création", "Date de modification", "Nom attribut français", "Nom base français",
+           "Nom frontière français"]
+
+# Share of the rows of each imported dataset, the rest being OTHER_CATEGORIES
+SHARES = {
+    'fr_regional_heating': 0.05,
+    'fr_electricity': 0.002,
+    'world_electricity': 0.02,
+    'fr_forestry': 0.02,
+}
+
+OTHER_CATEGORIES = [f'{level1} > {level2} > {level3}'
+                    for level1, level2s in {
+                        'Combustibles': ['Fossiles', 'Organiques', 'Autres'],
+                        'Transport de marchandises': ['Routier', 'Ferroviaire', 'Maritime', 'Aérien'],
+                        'Transport de personnes': ['Routier', 'Ferroviaire', 'Aérien'],
+                        'Achats de biens': ['Produits agricoles', 'Matériaux de construction', 'Produits chimiques'],
+                        'Achats de services': ['Services numériques', 'Services tertiaires'],
+                        'Process et émissions fugitives': ['Fluides frigorigènes', 'Emissions fugitives'],
+                        'Traitement des déchets': ['Incinération', 'Stockage', 'Recyclage'],
+                        'UTCF': ['Cultures', 'Prairies', 'Changement d\'affectation des sols'],
+                    }.items()
+                    for level2 in level2s
+                    for level3 in ['Général', 'Spécifique', 'Moyen', 'Données sectorielles']]
+
+FR_MONTH_NAMES = ['Janvier', 'Février', 'Mars', 'Avril', 'Mai', 'Juin', 'Juillet', 'Aout', 'Août',
+                  'Septembre', 'Octobre', 'Novembre', 'Décembre']
+UNITS = ['kgCO2e/kWh', 'kgCO2e/kWh PCI', 'kgCO2e/litre', 'kgCO2e/tonne', 'kgCO2e/t.km', 'kgCO2e/passager.km',
+         'kgCO2e/ha.an', 'kgCO2e/m²', 'kgCO2e/kg', 'kgCO2e/euro dépensé'] + [f'kgCO2e/unité {i}' for i in range(30)]
+SOURCES = ['ADEME', "AIE (Agence Internationale de l'Energie)", 'Arrêté du 15 septembre 2006', 'GIEC 2006',
+           'SNCU', 'Inventaire forestier national'] + [f'Etude sectorielle n°{i}' for i in range(194)]
+TREE_TYPES = ['Conifère', 'Feuillu', 'Mixte', 'Toutes compositions']
+FOREST_TYPES = ['Forêts fermées', 'Forêts fermées et ouvertes']
+POST_TYPES = [None, 'Amont', 'Combustion à la centrale', 'Transport et distribution']
+
+def generate_export(rows:int, path:Path, seed:int=0, chunksize:int=1_000_000) -> Path:
+    """
+    Write a synthetic export of the given number of rows, chunk by chunk (so memory doesn't depend on rows).
+    """
+    rng = np.random.default_rng(seed)
+    refs = reference_data()
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    with open(path, 'w', encoding=SOURCE_ENCODING, errors='replace', newline='') as f:
+        for start in range(0, rows, chunksize):
+            chunk = generate_rows(rng, refs, first_id=start + 1, rows=min(chunksize, rows - start))
+            chunk.to_csv(f, header=(start == 0), index=False)
+    logging.info(f'Generated {rows} rows in {path}.')
+
+    return path
+
+def reference_data() -> Dict[str, pd.DataFrame]:
+    depts = pd.read_csv(DATA_DIR / 'french_dept.csv', encoding='latin-1')
+    depts.columns = ['dept_id', 'dept_name', 'city', 'region']
+    countries = pd.read_csv(DATA_DIR / 'countries.csv', encoding='latin-1', keep_default_na=False)
+    return {'depts': depts.apply(lambda col: col.astype(str).str.strip()), 'countries': countries}
+
+def generate_rows(rng:np.random.Generator, refs:Dict[str, pd.DataFrame], first_id:int, rows:int) -> pd.DataFrame:
+    counts = rng.multinomial(rows, list(SHARES.values()) + [1 - sum(SHARES.values())])
+    blocks = [
+        heating_rows(rng, refs, counts[0]),
+        fr_electricity_rows(rng, counts[1]),
+        world_electricity_rows(rng, refs, counts[2]),
+        forestry_rows(rng, refs, counts[3]),
+        other_rows(rng, counts[4]),
+    ]
+    data = pd.concat(blocks, ignore_index=True).reindex(columns=COLUMNS)
+    data = data.iloc[rng.permutation(len(data))].reset_index(drop=True) # Datasets interleaved, as categories are
+
+    # Columns common to all rows
+    data["Identifiant de l'élément"] = np.arange(first_id, first_id + rows)
+    data['Type Ligne'] = np.where(data['Type poste'].isna(), 'Elément', 'Poste')
+    data["Statut de l'élément"] = rng.choice(['Valide générique', 'Valide spécifique', 'Archivé'], rows, p=[0.7, 0.2, 0.1])
+    data['Structure'] = rng.choice(['Elément', 'Elément décomposé', 'Poste'], rows)
+    data['Programme'] = rng.choice([None, 'Base Carbone', 'Base Empreinte'], rows)
+    data['Transparence'] = rng.choice([None, 'Transparent', 'Agrégé'], rows)
+    for col in ['Qualité', 'Qualité TeR', 'Qualité GR', 'Qualité TiR', 'Qualité C', 'Qualité P', 'Qualité M']:
+        data[col] = rng.choice([None, '1', '2', '3', '4', '5'], rows)
+    data['Incertitude'] = rng.choice([np.nan, 5, 10, 20, 30, 50], rows)
+    data['Date de création'] = fr_month_dates(rng, rows)
+    data['Date de modification'] = fr_month_dates(rng, rows)
+    data['Source'] = data['Source'].fillna(pd.Series(rng.choice(SOURCES, rows)))
+    data['Unité français'] = data['Unité français'].fillna(pd.Series(rng.choice(UNITS, rows)))
+
+    return data
+
+def fr_month_dates(rng:np.random.Generator, rows:int) -> pd.Series:
+    months = pd.Series(rng.choice(FR_MONTH_NAMES, rows))
+    return months + ' ' + pd.Series(rng.integers(2014, 2024, rows)).astype(str)
+
+def heating_rows(rng:np.random.Generator, refs:Dict[str, pd.DataFrame], rows:int) -> pd.DataFrame:
+    depts = refs['depts'].iloc[rng.integers(0, len(refs['depts']), rows)].reset_index(drop=True)
+    heat = rng.random(rows) < 0.85
+    sub_location = depts['region'] + ', ' + depts['city']
+    sub_location[rng.random(rows) < 0.01] = None # Missing for Corsica in the export
+    street = pd.Series(rng.integers(1, 200, rows)).astype(str) + ' rue de la ' + pd.Series(rng.choice(['Gare', 'Mairie', 'Paix'], rows))
+    street += np.where(np.arange(rows) % 10 == 0, ', bâtiment B', '') # Some addresses span 2 fields
+    return pd.DataFrame({
+        'Code de la catégorie': np.where(heat, 'Réseaux de chaleur / froid > Chaleur', 'Réseaux de chaleur / froid > Froid'),
+        'Localisation géographique': 'France continentale',
+        'Sous-localisation géographique français': sub_location,
+        'Période de validité': 'Année ' + pd.Series(rng.integers(2015, 2023, rows)).astype(str),
+        'Unité français': 'kgCO2e/kWh',
+        'Total poste non décomposé': np.where(rng.random(rows) < 0.03, 0.0, rng.lognormal(-2, 0.5, rows).round(4)),
+        'Source': 'SNCU',
+        'Nom attribut français': depts['dept_id'].str.lstrip('0') + ', ' + depts['city'] + ', ' + street,
+        'Nom base français': np.where(heat, 'Réseau de chaleur', 'Réseau de froid'),
+    })
+
+def fr_electricity_rows(rng:np.random.Generator, rows:int) -> pd.DataFrame:
+    return pd.DataFrame({
+        'Code de la catégorie': 'Electricité > Mix réseau électrique > France continentale > Moyen',
+        'Localisation géographique': 'France continentale',
+        'Période de validité': 'Année ' + pd.Series(rng.integers(2010, 2023, rows)).astype(str),
+        'Type poste': rng.choice(POST_TYPES, rows),
+        'Unité français': 'kgCO2e/kWh',
+        'Total poste non décomposé': rng.normal(0.06, 0.01, rows).round(4),
+        'Source': 'ADEME',
+        'Nom attribut français': rng.choice(['mix moyen', 'mix marginal'], rows, p=[0.8, 0.2]),
+    })
+
+def world_electricity_rows(rng:np.random.Generator, refs:Dict[str, pd.DataFrame], rows:int) -> pd.DataFrame:
+    countries = refs['countries']['fr_country_name'].to_numpy()
+    years = pd.Series(rng.integers(0, 23, rows)).astype(str).str.zfill(2)
+    return pd.DataFrame({
+        'Code de la catégorie': 'Electricité > Mix réseau électrique > Autres pays du monde',
+        'Localisation géographique': 'Monde',
+        'Sous-localisation géographique français': rng.choice(countries, rows),
+        'Période de validité': pd.Series(rng.choice(['déc.-', 'déc-'], rows)) + years,
+        'Type poste': rng.choice(POST_TYPES, rows),
+        'Unité français': 'kgCO2e/kWh',
+        'Total poste non décomposé': rng.lognormal(-1, 0.6, rows).round(4),
+        'Source': "AIE (Agence Internationale de l'Energie)",
+    })
+
+def forestry_rows(rng:np.random.Generator, refs:Dict[str, pd.DataFrame], rows:int) -> pd.DataFrame:
+    regions = np.append(refs['depts']['region'].unique(), 'France')
+    return pd.DataFrame({
+        'Code de la catégorie': pd.Series(rng.choice(['UTCF', 'Statistiques territoriales'], rows))
+                                + ' > Forêts françaises > ' + pd.Series(rng.choice(['Défrichement', 'Boisement'], rows)),
+        'Localisation géographique': 'France continentale',
+        'Période de validité': '31/12/' + pd.Series(rng.integers(2015, 2023, rows)).astype(str),
+        'Unité français': 'kgCO2e/ha.an',
+        'Total poste non décomposé': -rng.lognormal(8, 0.5, rows).round(0),
+        'Source': 'Inventaire forestier national',
+        'Nom attribut français': rng.choice(TREE_TYPES, rows),
+        'Nom base français': rng.choice(FOREST_TYPES, rows),
+        'Nom frontière français': rng.choice(regions, rows),
+    })
+
+def other_rows(rng:np.random.Generator, rows:int) -> pd.DataFrame:
+    return pd.DataFrame({
+        'Code de la catégorie': rng.choice(OTHER_CATEGORIES, rows),
+        'Localisation géographique': rng.choice(['France continentale', 'Europe', 'Monde'], rows),
+        'Période de validité': 'Année ' + pd.Series(rng.integers(2010, 2023, rows)).astype(str),
+        'Type poste': rng.choice(POST_TYPES[:2], rows, p=[0.8, 0.2]),
+        'Total poste non décomposé': rng.lognormal(0, 1.5, rows).round(4),
+        'Nom attribut français': pd.Series(rng.choice(['Moyen', 'Gazole', 'Blé tendre', 'Acier', 'Béton', 'Papier'], rows))
+                                 + ' ' + pd.Series(rng.integers(1, 50, rows)).astype(str),
+        'Nom base français': rng.choice(['Valeur moyenne', 'Valeur spécifique', 'Données constructeur'], rows),
+    })
+
+if __name__=="__main__":
+    parser = argparse.ArgumentParser(description='Generate a synthetic Base Carbone export.')
+    parser.add_argument('--rows', type=int, default=100_000, help='Rows of the export, e.g. 10000 to 10000000.')
+    parser.add_argument('--out', default='data/donnees_candidats_dev_python.csv', help='Path of the generated csv.')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    generate_export(args.rows, args.out, args.seed)
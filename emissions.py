@@ -1,43 +1,181 @@
+import sys
 import pandas as pd
-from pathlib import Path
+import cProfile
+import argparse
 import logging
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
 
 from src.db.db_setup import create_db, init_db_dim_data, retrieve_db_dim_data
-from src.dataset_func.fr_regional_heating_emissions_data import import_fr_regional_heating_emissions_data
-from src.dataset_func.fr_electricity_emissions_data import import_fr_electricity_emissions_data
-from src.dataset_func.world_electricity_emissions_data import import_world_electricity_emissions_data
-from src.dataset_func.fr_forestry_area_data import import_FR_forestry_area_data
+from src.db.db_dims import Dimension
+from src.db.db_queries import upsert_data
+from src.db.db_aggregates import refresh_aggregates
+from src.db.db_connection import get_connection, get_db_path, set_db_path
+from src.db.db_export import EXPORT_DIR, export_snapshot
+from src.db.db_snapshots import SNAPSHOT_DIR, publish_snapshot
+from src.db.db_shadow import COPY_METHODS, check_shadow_db, copy_shadow_db, discard_shadow_db, prepare_shadow_db, shadow_changed
+from src.utils.source_utils import CACHE_DIR, CHUNK_SIZE, load_source
+from src.utils.profiling_utils import METRICS_FILE, PipelineProfiler
+from src.dataset_func import fr_regional_heating_emissions_data as fr_regional_heating
+from src.dataset_func import fr_electricity_emissions_data as fr_electricity
+from src.dataset_func import world_electricity_emissions_data as world_electricity
+from src.dataset_func import fr_forestry_area_data as fr_forestry
 
 logging.basicConfig(level=logging.INFO)
 
-def main() -> None:
-    
-    data_file_path = Path.cwd() / "data" / "donnees_candidats_dev_python.csv"
-    full_dataset = pd.read_csv(data_file_path, encoding='latin-1')
-    
+class Dataset(NamedTuple):
+    name: str
+    category: str # Category prefix, see CategoryPartitioner
+    retrieve: Callable[[pd.DataFrame], pd.DataFrame]
+    clean: Callable[[pd.DataFrame], pd.DataFrame]
+    prep: Callable[[pd.DataFrame, Dict[str, Dimension]], pd.DataFrame]
+    table: str
+
+DATASETS = [
+    Dataset('fr_regional_heating_emissions', fr_regional_heating.CATEGORY,
+            fr_regional_heating.retrieve_fr_regional_heating_emissions_data,
+            fr_regional_heating.clean_fr_regional_heating_emissions_data,
+            fr_regional_heating.prep_fr_regional_heating_emissions_data,
+            fr_regional_heating.DB_TABLE),
+    Dataset('fr_electricity_emissions', fr_electricity.CATEGORY,
+            fr_electricity.retrieve_fr_electricity_emissions_data,
+            fr_electricity.clean_fr_electricity_emissions_data,
+            fr_electricity.prep_fr_electricity_emissions_data,
+            fr_electricity.DB_TABLE),
+    Dataset('world_electricity_emissions', world_electricity.CATEGORY,
+            world_electricity.retrieve_world_electricity_emissions_data,
+            world_electricity.clean_world_electricity_emissions_data,
+            world_electricity.prep_world_electricity_emissions_data,
+            world_electricity.DB_TABLE),
+    Dataset('fr_forestry_area', fr_forestry.CATEGORY,
+            fr_forestry.retrieve_FR_forestry_area_data,
+            fr_forestry.clean_FR_forestry_area_data,
+            fr_forestry.prep_FR_forestry_area_data,
+            fr_forestry.DB_TABLE),
+    # TODO: goods_emissions_data
+    # TODO: transport_emissions_data
+    # TODO: fuel_emissions_data
+    # TODO: eletricity_production_data
+    # TODO: waste_treatement_data
+    # TODO: land_use_data
+    # TODO: ...
+]
+
+def process(dataset:Dataset, category_data:pd.DataFrame, db_dims:Dict[str, Dimension],
+            profiler:PipelineProfiler) -> Tuple[pd.DataFrame, List[dict]]:
+    """
+    Retrieve, clean and prep a dataset, recording each stage's metrics.
+    Does not touch the db, so can run in a separate (worker) process.
+    -----------
+    returns:
+        (df ready for upload, stage metrics)
+    """
+    data = profiler.run(dataset.name, 'retrieve', dataset.retrieve, category_data)
+    data = profiler.run(dataset.name, 'clean', dataset.clean, data)
+    data = profiler.run(dataset.name, 'prep', dataset.prep, data, db_dims, db_dims=db_dims)
+    return data, profiler.records
+
+def store(dataset:Dataset, data:pd.DataFrame, profiler:PipelineProfiler) -> None:
+    """
+    Upsert a processed dataset, and refresh the aggregates of the groups its changed rows belong to.
+    """
+    # Rows out of the upsert are the rows inserted / updated (i.e. rows unchanged since the last import are dropped)
+    changed_data = profiler.run(dataset.name, 'upsert', upsert_data, data, dataset.table)
+    profiler.run(dataset.name, 'aggregates', lambda changed: refresh_aggregates(dataset.table, changed), changed_data)
+
+def main(workers:int=1, chunksize:int=CHUNK_SIZE, cache_dir:Optional[Path]=CACHE_DIR,
+         profiler:PipelineProfiler=None) -> PipelineProfiler:
+    profiler = profiler or PipelineProfiler()
+
+    # Read the source export once, in chunks (or from the parsed source cache if unchanged):
+    # each dataset only receives its own category rows, and the units & sources dimensions are collected in the same pass
+    categories = [dataset.category for dataset in DATASETS]
+    source = profiler.run('source', 'read', lambda categories: load_source(categories, chunksize=chunksize, cache_dir=cache_dir), categories)
+    init_db_dim_data(source.units, source.sources)
+
     db_dims = retrieve_db_dim_data()
-    
-    datasets = [
-        import_fr_regional_heating_emissions_data,
-        import_fr_electricity_emissions_data,
-        import_world_electricity_emissions_data,
-        import_FR_forestry_area_data
-        # TODO: goods_emissions_data
-        # TODO: transport_emissions_data
-        # TODO: fuel_emissions_data
-        # TODO: eletricity_production_data
-        # TODO: waste_treatement_data
-        # TODO: land_use_data
-        # TODO: ...
-    ]
-    
-    for dataset_func in datasets:
-        try:
-            dataset_func(full_dataset, db_dims)
-        except Exception as e:
-            logging.error(e)
+
+    # Each dataset's stages are recorded by their own profiler (i.e. in their own process), and merged back
+    def dataset_profiler() -> PipelineProfiler:
+        return PipelineProfiler(profiler.run_id, profiler.trace_memory)
+
+    if workers <= 1:
+        for dataset in DATASETS:
+            try:
+                data, records = process(dataset, source.partitions[dataset.category], db_dims, dataset_profiler())
+                profiler.merge(records)
+                store(dataset, data, profiler)
+            except Exception as e:
+                logging.error(e)
+        return profiler
+
+    # Clean & prep datasets in parallel. Workers are only sent their own category slice,
+    # and all db writes (upserts & aggregates) are left to this (single writer) process.
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(process, dataset, source.partitions[dataset.category], db_dims, dataset_profiler()): dataset
+                   for dataset in DATASETS}
+        for future in as_completed(futures):
+            try:
+                data, records = future.result()
+                profiler.merge(records)
+                store(futures[future], data, profiler)
+            except Exception as e:
+                logging.error(e)
+
+    return profiler
 
 if __name__=="__main__":
+    parser = argparse.ArgumentParser(description='Initialise the db and import all datasets.')
+    parser.add_argument('--workers', type=int, default=1, help='Number of processes used to clean & prep datasets.')
+    parser.add_argument('--chunksize', type=int, default=CHUNK_SIZE, help='Rows of the source export read at once.')
+    parser.add_argument('--no-cache', action='store_true', help=f'Always parse the source export, rather than using the cache ({CACHE_DIR}).')
+    parser.add_argument('--db', default=get_db_path(), help='Path of the sqlite db file (default: $ECOACT_DB_PATH or ecoact.db).')
+    parser.add_argument('--export-parquet', nargs='?', const=EXPORT_DIR, default=None, metavar='DIR',
+                        help=f'Export a Parquet/Arrow snapshot of all tables once imported (default dir: {EXPORT_DIR}, requires pyarrow).')
+    parser.add_argument('--publish-snapshot', nargs='?', const=SNAPSHOT_DIR, default=None, metavar='DIR',
+                        help=f'Publish a read-only snapshot of the db once imported, for the API serving mode (default dir: {SNAPSHOT_DIR}).')
+    parser.add_argument('--shadow-copy', choices=COPY_METHODS, default='backup',
+                        help='How the db is copied to the shadow db imports run into: sqlite backup, or VACUUM INTO (compacted).')
+    parser.add_argument('--in-place', action='store_true',
+                        help='Import into the db file itself, rather than into a shadow db copied back once checked.')
+    parser.add_argument('--metrics', default=METRICS_FILE, help='JSON lines file the per stage metrics are appended to.')
+    parser.add_argument('--trace-memory', action='store_true', help='Record the peak python allocations of each stage (tracemalloc, slower).')
+    parser.add_argument('--profile', nargs='?', const='ingest.prof', default=None, metavar='FILE',
+                        help='Write a cProfile dump of the ingest (main process), e.g. for snakeviz or flameprof.')
+    args = parser.parse_args()
+
+    # Imports run into a shadow copy of the db, copied back into it once checked: readers never see a partial import
+    set_db_path(args.db if args.in_place else prepare_shadow_db(args.db, args.shadow_copy))
+
+    cprofiler = cProfile.Profile() if args.profile else None
+    if cprofiler:
+        cprofiler.enable()
+
     create_db()
-    init_db_dim_data()
-    main()
\ No newline at end of file
+    profiler = main(workers=args.workers, chunksize=args.chunksize, cache_dir=None if args.no_cache else CACHE_DIR,
+                    profiler=PipelineProfiler(trace_memory=args.trace_memory))
+
+    if cprofiler:
+        cprofiler.disable()
+        cprofiler.dump_stats(args.profile)
+        logging.info(f'Wrote cProfile dump to {args.profile}.')
+    profiler.write(args.metrics)
+    logging.info(f'Ingest stages:\n{profiler.summary().to_string(index=False)}')
+
+    if not args.in_place:
+        shadow = get_db_path()
+        if not shadow_changed(shadow, args.db, get_connection().total_changes):
+            discard_shadow_db(shadow)
+            logging.info(f'Kept {args.db} unchanged, as the import changed nothing.')
+        else:
+            failures = check_shadow_db(shadow, args.db)
+            if failures:
+                logging.error(f'Kept {args.db} unchanged, as the imported db ({shadow}) failed its checks:\n' + '\n'.join(failures))
+                sys.exit(1)
+            copy_shadow_db(shadow, args.db)
+        set_db_path(args.db)
+    if args.export_parquet:
+        export_snapshot(args.export_parquet)
+    if args.publish_snapshot:
+        publish_snapshot(args.publish_snapshot)
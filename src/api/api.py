@@ -1,95 +1,215 @@
-from fastapi import FastAPI
-import json
-from sqlalchemy import create_engine, text
-from sqlalchemy.orm import sessionmaker
+from fastapi import FastAPI, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from contextlib import asynccontextmanager
+from datetime import date, timedelta
+from typing import Any, AsyncIterator, Dict, List, Optional
+import orjson
 
-app = FastAPI()
-engine = create_engine("sqlite:///ecoact.db", connect_args={"check_same_thread": False})
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+from src.api.api_db import pool
+from src.api.api_cache import ResponseCache, etag_matches
+from src.db.db_connection import data_version
+from src.api.api_queries import (WORLD_ELEC_MIX_EMISSIONS, WORLD_ELEC_MIX_EMISSIONS_BY_COUNTRY, WORLD_ELEC_MIX_EMISSIONS_KEYS,
+                                 WORLD_ELEC_MIX_EMISSIONS_PAGE,
+                                 WORLD_ELEC_MIX_EMISSIONS_BATCH, WORLD_ELEC_MIX_EMISSIONS_BATCH_BY_POST_TYPE, WORLD_ELEC_MIX_EMISSIONS_BATCH_KEYS,
+                                 FR_REGIONAL_HEATING_EMISSIONS, FR_REGIONAL_HEATING_EMISSIONS_BY_DEPT, FR_REGIONAL_HEATING_EMISSIONS_KEYS,
+                                 FR_REGIONAL_HEATING_EMISSIONS_PAGE, FR_REGIONAL_HEATING_EMISSIONS_BATCH,
+                                 WORLD_ELEC_MIX_EMISSIONS_SUMMARY, WORLD_ELEC_MIX_EMISSIONS_SUMMARY_BY_COUNTRY, WORLD_ELEC_MIX_EMISSIONS_SUMMARY_KEYS,
+                                 FR_REGIONAL_HEATING_EMISSIONS_SUMMARY, FR_REGIONAL_HEATING_EMISSIONS_SUMMARY_BY_DEPT,
+                                 FR_REGIONAL_HEATING_EMISSIONS_SUMMARY_KEYS,
+                                 FR_FORESTRY_AREA_SUMMARY)
 
-## World Electricity mix emissions
-@app.get("/world_elec_mix_emissions")
-def get_world_electricity_mix_emissions():
-    db = SessionLocal()
-
-    try:  
-        query = text("""SELECT json_object(
-                        'Country', country_iso_3, 
-                        'Emissions', emissions, 
-                        'Date for', validity_date
-                    ) 
-                    FROM world_electricity_emissions
-                    """)
-        result = db.execute(query).fetchall()
-    finally:
-        db.close()
+STREAM_BATCH_SIZE = 1_000 # Rows fetched from the db per streamed chunk
+MAX_BATCH_KEYS = 500      # Keys per batch request
 
-    if result:
-        json_data = [json.loads(d[0]) for d in result]
-        return json_data
+@asynccontextmanager
+async def lifespan(app:FastAPI):
+    yield
+    pool.close()
 
-@app.get("/world_elec_mix_emissions/{country_iso_3}")
-def get_world_electricity_mix_emissions(country_iso_3: str):
-    db = SessionLocal()
-
-    try:  
-        query = text("""SELECT json_object(
-                            'Country', country_iso_3, 
-                            'Emissions', emissions, 
-                            'Date for', validity_date
-                        ) 
-                        FROM world_electricity_emissions
-                        WHERE country_iso_3=:country_iso_3
-                        """)
-        result = db.execute(query, {"country_iso_3": country_iso_3}).fetchall()
-    finally:
-        db.close()
+app = FastAPI(lifespan=lifespan)
+cache = ResponseCache()
+
+@app.middleware("http")
+async def cache_responses(request:Request, call_next):
+    """
+    Serve GET JSON responses from the response cache while the db's data version is unchanged,
+    with a 304 (and no body) when the client already holds the same ETag.
+    """
+    if request.method != 'GET':
+        return await call_next(request)
+
+    pool.refresh() # Switch to a newly published snapshot, if serving snapshots (see api_db.ReadPool)
+    version = (pool.db_path, data_version(pool.db_path))
+    key = (request.url.path, tuple(sorted(request.query_params.multi_items())))
+    cached = cache.get(key, version)
+
+    if cached is None:
+        response = await call_next(request)
+        if response.status_code != 200 or response.headers.get('content-type') != 'application/json':
+            return response # e.g. errors & ndjson streams
+        body = b''.join([chunk async for chunk in response.body_iterator])
+        cached = cache.put(key, version, body, 'application/json', dict(response.headers))
+
+    headers = {'ETag': cached.etag, **cached.headers}
+    if etag_matches(request.headers.get('if-none-match'), cached.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=cached.body, media_type=cached.media_type, headers=headers)
+
+def orjson_response(content:Any) -> Response:
+    # Serialized with orjson, rather than by the (slower) default JSONResponse
+    return Response(content=orjson.dumps(content), media_type='application/json')
+
+async def json_array_response(query:str, params:Optional[dict]=None) -> Response:
+    """
+    For queries aggregating their rows with json_group_array:
+    return SQLite's JSON string as is, rather than decoding & re-encoding each row.
+    """
+    result = await pool.fetch_scalar(query, params or {})
+
+    if result == '[]':
+        result = 'null' # As per previous (empty) responses
+    return Response(content=result, media_type='application/json')
+
+async def json_rows_response(query:str, params:dict, keys:tuple) -> Response:
+    """
+    For queries returning plain tuples: zip each row with the response keys,
+    and serialize them all at once with orjson.
+    """
+    result = await pool.fetch_all(query, params)
 
     if result:
-        json_data = [json.loads(d[0]) for d in result]
-        return json_data
+        return orjson_response([dict(zip(keys, row)) for row in result])
+    return orjson_response(None)
+
+async def json_page_response(query:str, after:int, limit:int, keys:tuple) -> Response:
+    """
+    For keyset paginated queries (first column being the row id):
+    return one page of rows, and the cursor to the next page in the 'X-Next-After' header.
+    """
+    result = await pool.fetch_all(query, {'after': after, 'limit': limit})
+
+    response = orjson_response([dict(zip(keys, row[1:])) for row in result])
+    if len(result) == limit:
+        response.headers['X-Next-After'] = str(result[-1][0])
+    return response
+
+async def json_batch_response(query:str, keys:List[str], params:dict, response_keys:tuple) -> Response:
+    """
+    For batch queries (first column being the requested key): run a single query for all keys,
+    and return the rows grouped by key, in the requested order (empty for keys without rows).
+    """
+    result = await pool.fetch_all(query, {'keys': orjson.dumps(keys).decode(), **params})
+
+    grouped: Dict[str, List[dict]] = {key: [] for key in keys}
+    for row in result:
+        grouped[row[0]].append(dict(zip(response_keys, row)))
+    return orjson_response(grouped)
+
+def batch_keys(keys:str) -> List[str]:
+    """
+    Parse comma separated keys (e.g. 'FRA,DEU'), without duplicates.
+    """
+    keys = list(dict.fromkeys(key.strip() for key in keys.split(',') if key.strip()))
+    if not keys:
+        raise HTTPException(status_code=422, detail='No keys given.')
+    if len(keys) > MAX_BATCH_KEYS:
+        raise HTTPException(status_code=422, detail=f'At most {MAX_BATCH_KEYS} keys per request.')
+    return keys
+
+def validity_range(from_date:Optional[date], to_date:Optional[date]) -> Dict[str, str]:
+    """
+    Validity dates (stored as 'YYYY-MM-DD HH:MM:SS' text) from from_date to to_date (both included, default: unbounded),
+    as the [from, to) bounds of the batch queries.
+    """
+    return {'from': from_date.isoformat() if from_date else '0000-01-01',
+            'to': (to_date + timedelta(days=1)).isoformat() if to_date else '9999-12-31'}
+
+def ndjson_stream_response(query:str, after:int, limit:Optional[int], keys:tuple) -> StreamingResponse:
+    """
+    For keyset paginated queries (first column being the row id):
+    stream rows as newline delimited JSON, fetched as successive pages of STREAM_BATCH_SIZE rows,
+    so memory use doesn't depend on the number of rows, and no connection is held between pages.
+    """
+    async def ndjson_rows() -> AsyncIterator[bytes]:
+        cursor, remaining = after, limit or float('inf')
+        while remaining > 0:
+            batch_size = int(min(STREAM_BATCH_SIZE, remaining))
+            rows = await pool.fetch_all(query, {'after': cursor, 'limit': batch_size})
+            if rows:
+                yield b''.join(orjson.dumps(dict(zip(keys, row[1:]))) + b'\n' for row in rows)
+            if len(rows) < batch_size:
+                break
+            cursor, remaining = rows[-1][0], remaining - len(rows)
+
+    return StreamingResponse(ndjson_rows(), media_type='application/x-ndjson')
+
+## World Electricity mix emissions
+@app.get("/world_elec_mix_emissions")
+async def get_world_electricity_mix_emissions(limit: Optional[int] = Query(None, gt=0), after: int = 0,
+                                              format: str = Query('json', pattern='^(json|ndjson)$')):
+    if format == 'ndjson':
+        return ndjson_stream_response(WORLD_ELEC_MIX_EMISSIONS_PAGE, after, limit, WORLD_ELEC_MIX_EMISSIONS_KEYS)
+    if limit or after:
+        return await json_page_response(WORLD_ELEC_MIX_EMISSIONS_PAGE, after, limit or -1, WORLD_ELEC_MIX_EMISSIONS_KEYS)
+    return await json_array_response(WORLD_ELEC_MIX_EMISSIONS)
+
+@app.get("/world_elec_mix_emissions/{country_iso_3}")
+async def get_world_electricity_mix_emissions_by_country(country_iso_3: str):
+    return await json_rows_response(WORLD_ELEC_MIX_EMISSIONS_BY_COUNTRY, {"country_iso_3": country_iso_3}, WORLD_ELEC_MIX_EMISSIONS_KEYS)
 
 ## FR Regional heating emissions
 @app.get("/fr_regional_heating_emissions")
-def get_fr_regional_heating_emissions():
-    db = SessionLocal()
-
-    try:  
-        query = text("""SELECT json_object(
-                        'Department', dept_id, 
-                        'Emissions', emissions, 
-                        'Date for', validity_date
-                    ) 
-                    FROM fr_regional_heating_emissions
-                    """)
-        result = db.execute(query).fetchall()
-    finally:
-        db.close()
+async def get_fr_regional_heating_emissions(limit: Optional[int] = Query(None, gt=0), after: int = 0,
+                                            format: str = Query('json', pattern='^(json|ndjson)$')):
+    if format == 'ndjson':
+        return ndjson_stream_response(FR_REGIONAL_HEATING_EMISSIONS_PAGE, after, limit, FR_REGIONAL_HEATING_EMISSIONS_KEYS)
+    if limit or after:
+        return await json_page_response(FR_REGIONAL_HEATING_EMISSIONS_PAGE, after, limit or -1, FR_REGIONAL_HEATING_EMISSIONS_KEYS)
+    return await json_array_response(FR_REGIONAL_HEATING_EMISSIONS)
 
-    if result:
-        json_data = [json.loads(d[0]) for d in result]
-        return json_data
+@app.get("/fr_regional_heating_emissions/{dept_id}")
+async def get_fr_regional_heating_emissions_by_region(dept_id: str):
+    return await json_rows_response(FR_REGIONAL_HEATING_EMISSIONS_BY_DEPT, {"dept_id": dept_id}, FR_REGIONAL_HEATING_EMISSIONS_KEYS)
 
+## Batch lookups (many keys in a single query, rows grouped by key)
+@app.get("/batch/world_elec_mix_emissions")
+async def get_world_electricity_mix_emissions_batch(countries: str = Query(..., description='e.g. FRA,DEU,ITA'),
+                                                    from_date: Optional[date] = Query(None, alias='from'),
+                                                    to_date: Optional[date] = Query(None, alias='to'),
+                                                    post_type_id: Optional[int] = None):
+    params = validity_range(from_date, to_date)
+    if post_type_id is None:
+        return await json_batch_response(WORLD_ELEC_MIX_EMISSIONS_BATCH, batch_keys(countries), params,
+                                         WORLD_ELEC_MIX_EMISSIONS_BATCH_KEYS)
+    return await json_batch_response(WORLD_ELEC_MIX_EMISSIONS_BATCH_BY_POST_TYPE, batch_keys(countries),
+                                     {'post_type_id': post_type_id, **params}, WORLD_ELEC_MIX_EMISSIONS_BATCH_KEYS)
 
-@app.get("/fr_regional_heating_emissions/{dept_id}")
-def get_fr_regional_heating_emissions_by_region(dept_id: str):
-    
-    db = SessionLocal()
-
-    try:  
-        query = text("""SELECT json_object(
-                        'Department', dept_id, 
-                        'Emissions', emissions, 
-                        'Date for', validity_date
-                    ) 
-                    FROM fr_regional_heating_emissions 
-                    WHERE dept_id=:dept_id
-                    """)
-        result = db.execute(query, {"dept_id": dept_id}).fetchall()
-    finally:
-        db.close()
+@app.get("/batch/fr_regional_heating_emissions")
+async def get_fr_regional_heating_emissions_batch(depts: str = Query(..., description='e.g. 01,2A,75'),
+                                                  from_date: Optional[date] = Query(None, alias='from'),
+                                                  to_date: Optional[date] = Query(None, alias='to')):
+    return await json_batch_response(FR_REGIONAL_HEATING_EMISSIONS_BATCH, batch_keys(depts), validity_range(from_date, to_date),
+                                     FR_REGIONAL_HEATING_EMISSIONS_KEYS)
 
-    if result:
-        json_data = [json.loads(d[0]) for d in result]
-        return json_data
+## Summaries (count/sum/min/max/mean per group, from the aggregate tables)
+@app.get("/summary/world_elec_mix_emissions")
+async def get_world_electricity_mix_emissions_summary():
+    return await json_array_response(WORLD_ELEC_MIX_EMISSIONS_SUMMARY)
+
+@app.get("/summary/world_elec_mix_emissions/{country_iso_3}")
+async def get_world_electricity_mix_emissions_summary_by_country(country_iso_3: str):
+    return await json_rows_response(WORLD_ELEC_MIX_EMISSIONS_SUMMARY_BY_COUNTRY, {"country_iso_3": country_iso_3},
+                                    WORLD_ELEC_MIX_EMISSIONS_SUMMARY_KEYS)
+
+@app.get("/summary/fr_regional_heating_emissions")
+async def get_fr_regional_heating_emissions_summary():
+    return await json_array_response(FR_REGIONAL_HEATING_EMISSIONS_SUMMARY)
+
+@app.get("/summary/fr_regional_heating_emissions/{dept_id}")
+async def get_fr_regional_heating_emissions_summary_by_dept(dept_id: str):
+    return await json_rows_response(FR_REGIONAL_HEATING_EMISSIONS_SUMMARY_BY_DEPT, {"dept_id": dept_id},
+                                    FR_REGIONAL_HEATING_EMISSIONS_SUMMARY_KEYS)
 
+@app.get("/summary/fr_forestry_area")
+async def get_fr_forestry_area_summary():
+    return await json_array_response(FR_FORESTRY_AREA_SUMMARY)
@@ -0,0 +1,76 @@
+"""
+This file contains the API's response cache: an in-process LRU cache of JSON response bodies,
+bounded in bytes, keyed on route & query parameters, and dropped whenever the db's data version changes
+(see db_connection.data_version). Each cached body has a strong ETag, for 304 responses to If-None-Match.
+"""
+import os
+import hashlib
+from collections import OrderedDict
+from typing import Any, Dict, NamedTuple, Optional, Tuple
+
+CACHE_SIZE = int(os.environ.get('ECOACT_API_CACHE_MB', 64)) * 1_000_000
+MAX_ENTRY_SIZE = CACHE_SIZE // 8 # Larger responses (e.g. full tables) are not worth evicting everything else
+
+# Response headers kept with the cached body
+CACHED_HEADERS = ('x-next-after',)
+
+class CachedResponse(NamedTuple):
+    body: bytes
+    media_type: str
+    etag: str
+    headers: Dict[str, str]
+
+class ResponseCache:
+    """
+    LRU cache of response bodies, for a single data version at a time.
+    """
+
+    def __init__(self, max_size:int=CACHE_SIZE, max_entry_size:int=MAX_ENTRY_SIZE) -> None:
+        self.max_size = max_size
+        self.max_entry_size = max_entry_size
+        self.size = 0
+        self.version: Any = None
+        self._entries: 'OrderedDict[Tuple, CachedResponse]' = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.size = 0
+
+    def get(self, key:Tuple, version:Any) -> Optional[CachedResponse]:
+        if version != self.version:
+            self.clear()
+            self.version = version
+            return None
+
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return entry
+
+    def put(self, key:Tuple, version:Any, body:bytes, media_type:str, headers:Optional[Dict[str, str]]=None) -> CachedResponse:
+        headers = dict(headers or {})
+        entry = CachedResponse(body, media_type, etag(body), {h: v for h, v in headers.items() if h in CACHED_HEADERS})
+        if version != self.version or len(body) > self.max_entry_size:
+            return entry # Not cached: either data changed while responding, or too large
+
+        if key in self._entries:
+            self.size -= len(self._entries.pop(key).body)
+        self._entries[key] = entry
+        self.size += len(body)
+        while self.size > self.max_size:
+            _, evicted = self._entries.popitem(last=False)
+            self.size -= len(evicted.body)
+
+        return entry
+
+def etag(body:bytes) -> str:
+    return f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+
+def etag_matches(if_none_match:Optional[str], etag:str) -> bool:
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(',')]
+    return '*' in tags or etag in tags
@@ -0,0 +1,156 @@
+"""
+This file contains the API's db access: a bounded pool of read-only sqlite connections,
+whose queries run on a dedicated thread pool, so async endpoints never block the event loop,
+nor hold a (shared) server threadpool slot while waiting on the db.
+In serving mode (ECOACT_SERVE_SNAPSHOTS=<snapshot dir>, e.g. for multi-worker uvicorn), connections are opened
+on the db snapshots published by the ingest (see db_snapshots.py), immutable & memory-mapped, so reads take no locks,
+and the pages are shared by all workers. The pool switches to a newly published snapshot between requests (see refresh).
+"""
+import os
+import queue
+import asyncio
+import sqlite3
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from pathlib import Path
+from typing import Any, Callable, List, NamedTuple, Optional, Tuple
+
+from src.db.db_connection import db_uri, get_db_path
+from src.db.db_snapshots import current_snapshot, warm_page_cache
+
+logging.basicConfig(level=logging.INFO)
+
+POOL_SIZE = int(os.environ.get('ECOACT_API_POOL_SIZE', 8))
+SERVE_SNAPSHOTS = os.environ.get('ECOACT_SERVE_SNAPSHOTS') # Snapshot dir, if serving snapshots
+
+READ_PRAGMAS = {
+    'query_only': 1,
+    'cache_size': -16_000,                                                   # 16MB page cache per connection
+    'mmap_size': int(os.environ.get('ECOACT_API_MMAP_MB', 1_024)) * 1_000_000, # Pages read from the (shared) OS page cache
+}
+
+class DbSource(NamedTuple):
+    db_path: str
+    immutable: bool # Snapshot, never written to
+
+class ReadPool:
+    """
+    Pool of read-only connections to a db file, each query being run on one of the pool's threads.
+    As there are as many connections as threads, a query never waits for a connection,
+    only for a thread (i.e. at most `size` concurrent queries).
+    Given a snapshot_dir, connections are opened on its current snapshot (immutable), see refresh.
+    """
+
+    def __init__(self, db_path:str, size:int=POOL_SIZE, snapshot_dir:Optional[str]=None) -> None:
+        self.source = DbSource(db_path, False) # Replaced as a whole, so always read consistently by the pool's threads
+        self.size = size
+        self.snapshot_dir = snapshot_dir
+        self._pointer_mtime: Optional[int] = None
+        self._connections: queue.SimpleQueue = queue.SimpleQueue()
+        for _ in range(size):
+            self._connections.put((None, None)) # (source, connection), opened on first use
+        self._executor = ThreadPoolExecutor(max_workers=size, thread_name_prefix='db-read')
+        self.refresh(wait=True)
+
+    @property
+    def db_path(self) -> str:
+        return self.source.db_path
+
+    def refresh(self, wait:bool=False) -> None:
+        """
+        In serving mode, switch to the latest published snapshot, if any (checked from the CURRENT pointer's mtime,
+        so a stat per call), once warmed (see serve_snapshot): on one of the pool's threads, unless wait,
+        the previous snapshot being served meanwhile. Called between requests: queries in flight complete
+        on their snapshot, whose connections are then reopened on the new one.
+        """
+        source = self.source
+        if self.snapshot_dir is None:
+            return
+        try:
+            pointer_mtime = os.stat(Path(self.snapshot_dir) / 'CURRENT').st_mtime_ns
+        except FileNotFoundError:
+            if self._pointer_mtime is None:
+                logging.warning(f'No snapshot published in {self.snapshot_dir} yet, serving {source.db_path}.')
+                self._pointer_mtime = 0
+            return
+        if pointer_mtime == self._pointer_mtime:
+            return
+
+        snapshot = current_snapshot(self.snapshot_dir)
+        self._pointer_mtime = pointer_mtime
+        if snapshot is not None and str(snapshot) != source.db_path:
+            if wait:
+                self.serve_snapshot(snapshot)
+            else:
+                self._executor.submit(self.serve_snapshot, snapshot)
+
+    def serve_snapshot(self, snapshot:Path) -> None:
+        """
+        Warm the OS page cache with the snapshot, then open connections on it from the next query,
+        unless a newer snapshot was published meanwhile.
+        """
+        try:
+            warm_page_cache(snapshot)
+        except FileNotFoundError:
+            logging.warning(f'Snapshot {snapshot} removed before it was served.')
+            return
+        if current_snapshot(self.snapshot_dir) == snapshot:
+            self.source = DbSource(str(snapshot), True)
+            logging.info(f'Serving snapshot {snapshot}.')
+
+    def connect(self, source:DbSource) -> sqlite3.Connection:
+        # immutable=1 (snapshots): no locks nor change checks at all, as the file never changes
+        # mode=ro: many concurrent readers of the WAL, without ever taking a write lock
+        mode = 'immutable=1' if source.immutable else 'mode=ro'
+        db = sqlite3.connect(db_uri(source.db_path, mode), uri=True, check_same_thread=False)
+        for pragma, value in READ_PRAGMAS.items():
+            db.execute(f"PRAGMA {pragma}={value}")
+        return db
+
+    def _run(self, func:Callable[..., Any], *args) -> Any:
+        source, db = self._connections.get()
+        try:
+            if db is not None and source != self.source:
+                db.close() # Opened on a previous snapshot
+                db = None
+            if db is None:
+                source = self.source
+                db = self.connect(source)
+            return func(db, *args)
+        finally:
+            self._connections.put((source, db))
+
+    async def run(self, func:Callable[..., Any], *args) -> Any:
+        """
+        Await func(connection, *args), run on one of the pool's threads.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, partial(self._run, func, *args))
+
+    async def fetch_scalar(self, query:str, params:Optional[dict]=None) -> Any:
+        return await self.run(fetch_scalar, query, params or {})
+
+    async def fetch_all(self, query:str, params:Optional[dict]=None) -> List[Tuple]:
+        return await self.run(fetch_all, query, params or {})
+
+    def close(self) -> None:
+        """
+        Close the pool's connections (waiting for queries in flight), e.g. at the end of the app's lifespan.
+        The threads are kept, and connections reopened on next use, so the pool can serve the app again in the same process.
+        """
+        connections = [self._connections.get() for _ in range(self.size)]
+        for _, db in connections:
+            if db is not None:
+                db.close()
+        for _ in range(self.size):
+            self._connections.put((None, None))
+
+def fetch_scalar(db:sqlite3.Connection, query:str, params:dict) -> Any:
+    row = db.execute(query, params).fetchone()
+    return row[0] if row else None
+
+def fetch_all(db:sqlite3.Connection, query:str, params:dict) -> List[Tuple]:
+    return db.execute(query, params).fetchall()
+
+pool = ReadPool(get_db_path(), snapshot_dir=SERVE_SNAPSHOTS)
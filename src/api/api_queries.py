@@ -0,0 +1,199 @@
+"""
+This file contains the SQL queries run by the API endpoints (see api.py),
+and a check that none of them falls back to a table scan, given the db indexes (see db_tables.py):
+    python -m src.api.api_queries [--db ecoact.db]
+"""
+import sqlite3
+import logging
+import argparse
+from typing import List
+
+from src.db.db_connection import get_connection, set_db_path
+from src.db.db_setup import create_db
+
+logging.basicConfig(level=logging.INFO)
+
+## World Electricity mix emissions
+# Full table queries: SQLite aggregates all rows into a single JSON array string
+WORLD_ELEC_MIX_EMISSIONS = """SELECT json_group_array(json_object(
+                                'Country', country_iso_3,
+                                'Emissions', emissions,
+                                'Date for', validity_date
+                            ))
+                            FROM world_electricity_emissions
+                            """
+
+# Lookups: plain tuples, serialized by the API (see WORLD_ELEC_MIX_EMISSIONS_KEYS)
+WORLD_ELEC_MIX_EMISSIONS_BY_COUNTRY = """SELECT country_iso_3, emissions, validity_date
+                                        FROM world_electricity_emissions
+                                        WHERE country_iso_3=:country_iso_3
+                                        """
+WORLD_ELEC_MIX_EMISSIONS_KEYS = ('Country', 'Emissions', 'Date for')
+
+# Batch lookups: the requested keys (a JSON array) are joined through json_each, as the outer loop (CROSS JOIN),
+# each key being a search of the covering index (validity range: [from, to), see api.py)
+# Joined on every post type (a handful of rows), so the validity range is part of the index search,
+# post_type_id sitting between country_iso_3 and validity_date in the index
+WORLD_ELEC_MIX_EMISSIONS_BATCH = """SELECT country_iso_3, post_type_id, emissions, validity_date
+                                   FROM json_each(:keys) AS batch_keys
+                                   CROSS JOIN Dim_Elec_mix_post_types AS post_types
+                                   CROSS JOIN world_electricity_emissions USING (post_type_id)
+                                   WHERE country_iso_3 = batch_keys.value
+                                   AND validity_date >= :from AND validity_date < :to
+                                   ORDER BY batch_keys.id, post_type_id, validity_date
+                                   """
+WORLD_ELEC_MIX_EMISSIONS_BATCH_BY_POST_TYPE = """SELECT country_iso_3, post_type_id, emissions, validity_date
+                                                FROM json_each(:keys) AS batch_keys
+                                                CROSS JOIN world_electricity_emissions ON country_iso_3 = batch_keys.value
+                                                WHERE post_type_id = :post_type_id
+                                                AND validity_date >= :from AND validity_date < :to
+                                                ORDER BY batch_keys.id, validity_date
+                                                """
+WORLD_ELEC_MIX_EMISSIONS_BATCH_KEYS = ('Country', 'Post type id', 'Emissions', 'Date for')
+
+# Keyset pagination on the autoincrement id (LIMIT -1 for no limit)
+WORLD_ELEC_MIX_EMISSIONS_PAGE = """SELECT id, country_iso_3, emissions, validity_date
+                                  FROM world_electricity_emissions
+                                  WHERE id > :after
+                                  ORDER BY id
+                                  LIMIT :limit
+                                  """
+
+## FR Regional heating emissions
+FR_REGIONAL_HEATING_EMISSIONS = """SELECT json_group_array(json_object(
+                                    'Department', dept_id,
+                                    'Emissions', emissions,
+                                    'Date for', validity_date
+                                ))
+                                FROM fr_regional_heating_emissions
+                                """
+
+FR_REGIONAL_HEATING_EMISSIONS_BY_DEPT = """SELECT dept_id, emissions, validity_date
+                                        FROM fr_regional_heating_emissions
+                                        WHERE dept_id=:dept_id
+                                        """
+FR_REGIONAL_HEATING_EMISSIONS_KEYS = ('Department', 'Emissions', 'Date for')
+
+FR_REGIONAL_HEATING_EMISSIONS_BATCH = """SELECT dept_id, emissions, validity_date
+                                        FROM json_each(:keys) AS batch_keys
+                                        CROSS JOIN fr_regional_heating_emissions ON dept_id = batch_keys.value
+                                        WHERE validity_date >= :from AND validity_date < :to
+                                        ORDER BY batch_keys.id, validity_date
+                                        """
+
+FR_REGIONAL_HEATING_EMISSIONS_PAGE = """SELECT id, dept_id, emissions, validity_date
+                                       FROM fr_regional_heating_emissions
+                                       WHERE id > :after
+                                       ORDER BY id
+                                       LIMIT :limit
+                                       """
+
+## Summaries, read from the materialized aggregate tables (see AGGREGATE_TABLES in db_tables.py), i.e. O(groups)
+SUMMARY_KEYS = ('Count', 'Sum', 'Min', 'Max', 'Mean')
+
+WORLD_ELEC_MIX_EMISSIONS_SUMMARY = """SELECT json_group_array(json_object(
+                                        'Country', country_iso_3,
+                                        'Post type', post_type_name,
+                                        'Year', year,
+                                        'Count', count, 'Sum', sum, 'Min', min, 'Max', max, 'Mean', mean
+                                    ))
+                                    FROM Agg_World_electricity_emissions
+                                    LEFT JOIN Dim_Elec_mix_post_types USING (post_type_id)
+                                    """
+
+WORLD_ELEC_MIX_EMISSIONS_SUMMARY_BY_COUNTRY = """SELECT country_iso_3, post_type_name, year, count, sum, min, max, mean
+                                                FROM Agg_World_electricity_emissions
+                                                LEFT JOIN Dim_Elec_mix_post_types USING (post_type_id)
+                                                WHERE country_iso_3=:country_iso_3
+                                                """
+WORLD_ELEC_MIX_EMISSIONS_SUMMARY_KEYS = ('Country', 'Post type', 'Year') + SUMMARY_KEYS
+
+FR_REGIONAL_HEATING_EMISSIONS_SUMMARY = """SELECT json_group_array(json_object(
+                                            'Department', dept_id,
+                                            'Heat cycle', heat_cycle,
+                                            'Year', year,
+                                            'Count', count, 'Sum', sum, 'Min', min, 'Max', max, 'Mean', mean
+                                        ))
+                                        FROM Agg_FR_regional_heating_emissions
+                                        """
+
+FR_REGIONAL_HEATING_EMISSIONS_SUMMARY_BY_DEPT = """SELECT dept_id, heat_cycle, year, count, sum, min, max, mean
+                                                FROM Agg_FR_regional_heating_emissions
+                                                WHERE dept_id=:dept_id
+                                                """
+FR_REGIONAL_HEATING_EMISSIONS_SUMMARY_KEYS = ('Department', 'Heat cycle', 'Year') + SUMMARY_KEYS
+
+FR_FORESTRY_AREA_SUMMARY = """SELECT json_group_array(json_object(
+                                'Region', region_name,
+                                'Forest type', forest_type_name,
+                                'Tree type', tree_type_name,
+                                'Count', count, 'Sum', sum, 'Min', min, 'Max', max, 'Mean', mean
+                            ))
+                            FROM Agg_FR_forestry_area
+                            LEFT JOIN Dim_Regions USING (region_id)
+                            LEFT JOIN Dim_Forest_types USING (forest_type_id)
+                            LEFT JOIN Dim_Tree_types USING (tree_type_id)
+                            """
+
+BATCH_RANGE = {'from': '2019-01-01', 'to': '2021-01-01'}
+
+# Query name: (query, example params, whether the query returns the full table)
+API_QUERIES = {
+    'WORLD_ELEC_MIX_EMISSIONS': (WORLD_ELEC_MIX_EMISSIONS, {}, True),
+    'WORLD_ELEC_MIX_EMISSIONS_BY_COUNTRY': (WORLD_ELEC_MIX_EMISSIONS_BY_COUNTRY, {'country_iso_3': 'FRA'}, False),
+    'WORLD_ELEC_MIX_EMISSIONS_BATCH': (WORLD_ELEC_MIX_EMISSIONS_BATCH, {'keys': '["FRA", "DEU"]', **BATCH_RANGE}, False),
+    'WORLD_ELEC_MIX_EMISSIONS_BATCH_BY_POST_TYPE': (WORLD_ELEC_MIX_EMISSIONS_BATCH_BY_POST_TYPE,
+                                                    {'keys': '["FRA", "DEU"]', 'post_type_id': 4, **BATCH_RANGE}, False),
+    'WORLD_ELEC_MIX_EMISSIONS_PAGE': (WORLD_ELEC_MIX_EMISSIONS_PAGE, {'after': 0, 'limit': 100}, False),
+    'FR_REGIONAL_HEATING_EMISSIONS': (FR_REGIONAL_HEATING_EMISSIONS, {}, True),
+    'FR_REGIONAL_HEATING_EMISSIONS_BY_DEPT': (FR_REGIONAL_HEATING_EMISSIONS_BY_DEPT, {'dept_id': '01'}, False),
+    'FR_REGIONAL_HEATING_EMISSIONS_BATCH': (FR_REGIONAL_HEATING_EMISSIONS_BATCH, {'keys': '["01", "2A"]', **BATCH_RANGE}, False),
+    'FR_REGIONAL_HEATING_EMISSIONS_PAGE': (FR_REGIONAL_HEATING_EMISSIONS_PAGE, {'after': 0, 'limit': 100}, False),
+    'WORLD_ELEC_MIX_EMISSIONS_SUMMARY': (WORLD_ELEC_MIX_EMISSIONS_SUMMARY, {}, True),
+    'WORLD_ELEC_MIX_EMISSIONS_SUMMARY_BY_COUNTRY': (WORLD_ELEC_MIX_EMISSIONS_SUMMARY_BY_COUNTRY, {'country_iso_3': 'FRA'}, False),
+    'FR_REGIONAL_HEATING_EMISSIONS_SUMMARY': (FR_REGIONAL_HEATING_EMISSIONS_SUMMARY, {}, True),
+    'FR_REGIONAL_HEATING_EMISSIONS_SUMMARY_BY_DEPT': (FR_REGIONAL_HEATING_EMISSIONS_SUMMARY_BY_DEPT, {'dept_id': '01'}, False),
+    'FR_FORESTRY_AREA_SUMMARY': (FR_FORESTRY_AREA_SUMMARY, {}, True),
+}
+
+# Scans of the keys of a lookup, rather than of a table
+KEY_SCANS = ('SCAN batch_keys VIRTUAL TABLE', 'SCAN post_types')
+
+def explain_query_plan(db:sqlite3.Connection, query:str, params:dict) -> List[str]:
+    return [row[-1] for row in db.execute(f"EXPLAIN QUERY PLAN {query}", params)]
+
+def check_query_plans(db:sqlite3.Connection) -> List[str]:
+    """
+    Run EXPLAIN QUERY PLAN for every API query.
+    Lookups must only SEARCH indexes (or SCAN the batch keys, i.e. the json_each virtual table, or the post types joined on),
+    and full table queries may only SCAN a covering index,
+    or an aggregate table (WITHOUT ROWID, i.e. its primary key index, holding one row per group).
+    -----------
+    returns:
+        list of failing query plan steps (empty if all queries pass)
+    """
+    failures = []
+    for name, (query, params, full_table) in API_QUERIES.items():
+        for step in explain_query_plan(db, query, params):
+            if step.startswith(KEY_SCANS):
+                continue
+            if step.startswith('SCAN') and not (full_table and ('COVERING INDEX' in step or step.startswith('SCAN Agg_'))):
+                failures.append(f'{name}: {step}')
+
+    return failures
+
+if __name__=="__main__":
+    parser = argparse.ArgumentParser(description='Check the query plan of every API query.')
+    parser.add_argument('--db', default=':memory:', help='Path of the sqlite db file (default: new in-memory db).')
+    args = parser.parse_args()
+
+    set_db_path(args.db)
+    if args.db == ':memory:':
+        create_db()
+
+    failures = check_query_plans(get_connection())
+    for failure in failures:
+        logging.error(f'Table scan in {failure}')
+    if failures:
+        raise SystemExit(1)
+    logging.info(f'All {len(API_QUERIES)} API query plans use indexes.')
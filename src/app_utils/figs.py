@@ -1,17 +1,27 @@
 import pandas as pd
 import plotly.express as px
-import json
 
-from src.db.db_queries import fetch_all_from_table
+from src.app_utils.geo_assets import load_geojson
+from src.app_utils import figs_data
+from src.app_utils.figs_data import check_data_version, versioned_cache
+
+# Figures are built once per selection & data version (see figs_data), as called on every app rerun
 
 def graph_world_electricity_emissions():
-    # Fetch data
-    emissions_df = fetch_all_from_table('World_electricity_emissions')
-    emissions_df['emissions'] *= 1_000 # Convert from kgCO2e/kWh to gCO2e/kWh
-    emissions_df['emissions'] = round(emissions_df['emissions'],2)
-    
-    # Remove outlier
-    emissions_df.drop(emissions_df[emissions_df['country_iso_3'] == 'BWA'].index, inplace=True)
+    return world_electricity_emissions_figure(check_data_version())
+
+def graph_fr_heating_emissions():
+    return fr_heating_emissions_figure(check_data_version())
+
+def graph_fr_forestry_change(forest_type, tree_type):
+    return fr_forestry_change_figure(forest_type, tree_type, check_data_version())
+
+@versioned_cache()
+def world_electricity_emissions_figure(version):
+    # Fetch data (without the outlier)
+    emissions_df = figs_data.world_electricity_emissions(version)
+    emissions_df = emissions_df[emissions_df['country_iso_3'] != 'BWA']
+    emissions_df = emissions_df.assign(emissions=round(emissions_df['emissions'] * 1_000, 2)) # Convert from kgCO2e/kWh to gCO2e/kWh
     
     # Plot graph
     fig = px.choropleth(emissions_df, 
@@ -36,20 +46,14 @@ def graph_world_electricity_emissions():
 
     return fig
 
-def graph_fr_heating_emissions():
+@versioned_cache()
+def fr_heating_emissions_figure(version):
     # Fetch data
-    emissions_df = fetch_all_from_table('FR_regional_heating_emissions')
-    dept_df = fetch_all_from_table('Dim_Departments')
-    emissions_df = emissions_df.merge(dept_df, on='dept_id', how='left')
-    emissions_df = emissions_df[emissions_df['heat_cycle']=='heat']
-    emissions_df = emissions_df[emissions_df['validity_date']=='2020-01-01 00:00:00']
-    dept_group = emissions_df.groupby('dept_id').mean().reset_index()  # Simple agg - TODO
-    dept_group['emissions'] *= 1_000 # Convert from kgCO2e/kWh to gCO2e/kWh
-    dept_group['emissions'] = round(dept_group['emissions'],2)
+    dept_group = figs_data.fr_heating_emissions('heat', 2020, version)
+    dept_group = dept_group.assign(emissions=round(dept_group['emissions'] * 1_000, 2)) # Convert from kgCO2e/kWh to gCO2e/kWh
     
-    # Load the GeoJSON file for French departments
-    with open('./maps/fr_departements.geojson') as f:
-        fr_dept_geojson = json.load(f)
+    # Load the (cached, simplified) GeoJSON for French departments
+    fr_dept_geojson = load_geojson('fr_departements')
 
     # Plot graph
     fig = px.choropleth(dept_group, 
@@ -71,25 +75,13 @@ def graph_fr_heating_emissions():
     )
     return fig
 
-def graph_fr_forestry_change(forest_type, tree_type):
-    # Fetch data
-    forestry_df = fetch_all_from_table('FR_forestry_area')
-    dept_df = fetch_all_from_table('Dim_Regions')
-    forest_types_df = fetch_all_from_table('Dim_Forest_types')
-    tree_types_df = fetch_all_from_table('Dim_Tree_types')
-    
-    # Merge dimensions
-    forestry_df = forestry_df.merge(dept_df, on='region_id', how='left')
-    forestry_df = forestry_df.merge(forest_types_df, on='forest_type_id', how='left')
-    forestry_df = forestry_df.merge(tree_types_df, on='tree_type_id', how='left')
-    
-    # Select sub-set as per user request
-    forestry_df = forestry_df[forestry_df['forest_type_name'] == forest_type]
-    forestry_df = forestry_df[forestry_df['tree_type_name'] == tree_type]
+@versioned_cache(maxsize=32)
+def fr_forestry_change_figure(forest_type, tree_type, version):
+    # Select sub-set as per user request, from the (cached) dimension-joined data
+    forestry_df = figs_data.fr_forestry_selection(forest_type, tree_type, version)
     
-    # Load the GeoJSON file for French departments
-    with open('./maps/fr_regions.geojson') as f:
-        fr_regions_geojson = json.load(f)
+    # Load the (cached, simplified) GeoJSON for French regions
+    fr_regions_geojson = load_geojson('fr_regions')
 
     # Plot graph
     fig = px.choropleth(forestry_df, 
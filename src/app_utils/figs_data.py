@@ -0,0 +1,87 @@
+"""
+This file contains the data behind the app's figures (see figs.py), held in memory per db data version
+(see db_connection.data_version). Data is read from the aggregate tables maintained at ingest (see db_aggregates.py),
+with joins & filters run by sqlite (see db_queries.fetch_query), so reads are O(groups), whatever the size of the fact tables.
+Selections are precomputed where all of them can be aggregated at once (e.g. forestry groupby indexes).
+Changing a selection in app.py thus only slices in-memory frames, without any sqlite I/O,
+while any write to the db (e.g. a new import) invalidates all cached data & figures on the next rerun.
+"""
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, NamedTuple, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.db.db_connection import data_version
+from src.db.db_queries import fetch_query
+
+_cached_funcs: List[Callable] = []
+_version: Any = None
+
+def versioned_cache(maxsize:int=None) -> Callable:
+    """
+    lru_cache whose functions take the data version as (last) argument,
+    and are cleared whenever check_data_version() sees a new version, so old versions are not kept in memory.
+    """
+    def decorator(func:Callable) -> Callable:
+        cached_func = lru_cache(maxsize=maxsize)(func)
+        _cached_funcs.append(cached_func)
+        return cached_func
+    return decorator
+
+def check_data_version() -> Tuple[int, ...]:
+    """
+    Return the db's current data version (from os.stat only), clearing all cached data on change.
+    """
+    global _version
+    version = data_version()
+    if version != _version:
+        clear_caches()
+        _version = version
+    return version
+
+def clear_caches() -> None:
+    for func in _cached_funcs:
+        func.cache_clear()
+
+class ForestryData(NamedTuple):
+    data: pd.DataFrame
+    groups: Dict[Tuple[str, str], np.ndarray] # (forest_type_name, tree_type_name) -> row positions
+
+@versioned_cache()
+def world_electricity_emissions(version:Tuple[int, ...]) -> pd.DataFrame:
+    """
+    Average total (i.e. all post types) emissions per country, over all years.
+    """
+    emissions_df = fetch_query('Agg_World_electricity_emissions', ['country_iso_3'],
+                               joins={'Dim_Elec_mix_post_types': 'post_type_id'},
+                               filters={'post_type_name': 'Total'},
+                               aggregates={'sum': ('SUM', 'sum'), 'count': ('SUM', 'count')})
+    return emissions_df.assign(emissions=emissions_df['sum'] / emissions_df['count'])
+
+@versioned_cache(maxsize=32)
+def fr_heating_emissions(heat_cycle:str, year:int, version:Tuple[int, ...]) -> pd.DataFrame:
+    """
+    Average emissions per department, for the given heat cycle & year.
+    """
+    emissions_df = fetch_query('Agg_FR_regional_heating_emissions', ['dept_id', 'mean'],
+                               filters={'heat_cycle': heat_cycle, 'year': year})
+    return emissions_df.rename(columns={'mean': 'emissions'})
+
+@versioned_cache()
+def fr_forestry_area(version:Tuple[int, ...]) -> ForestryData:
+    """
+    Average land loss per region, forest type & tree type (i.e. for all selections at once).
+    """
+    forestry_df = fetch_query('Agg_FR_forestry_area', ['region_name', 'forest_type_name', 'tree_type_name', 'mean'],
+                              joins={'Dim_Regions': 'region_id',
+                                     'Dim_Forest_types': 'forest_type_id',
+                                     'Dim_Tree_types': 'tree_type_id'})
+    forestry_df = forestry_df.rename(columns={'mean': 'land_loss'})
+    groups = forestry_df.groupby(['forest_type_name', 'tree_type_name']).indices
+    return ForestryData(forestry_df, groups)
+
+def fr_forestry_selection(forest_type:str, tree_type:str, version:Tuple[int, ...]) -> pd.DataFrame:
+    forestry = fr_forestry_area(version)
+    rows = forestry.groups.get((forest_type, tree_type), np.array([], dtype=np.intp))
+    return forestry.data.iloc[rows]
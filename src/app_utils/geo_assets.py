@@ -0,0 +1,211 @@
+"""
+This file contains the map geometries used by the choropleths (see figs.py).
+Each GeoJSON file is simplified ahead of time at several LEVELS of detail, and stored compactly
+(quantized, delta-encoded & gzipped coordinates) under maps/simplified, by running:
+    python -m src.app_utils.geo_assets
+Simplification is topology-preserving: borders shared by neighbouring areas are split into arcs
+at their junctions, and each arc is simplified once, so neighbours never gap or overlap.
+"""
+import gzip
+import json
+import logging
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+logging.basicConfig(level=logging.INFO)
+
+MAPS = {
+    'fr_departements': Path('./maps/fr_departements.geojson'),
+    'fr_regions': Path('./maps/fr_regions.geojson'),
+}
+SIMPLIFIED_DIR = Path('./maps/simplified')
+
+QUANTIZATION = 10_000 # Grid of 1e-4 degrees (~10m)
+LEVELS = { # Simplification tolerance, in degrees
+    'low': 0.02,
+    'medium': 0.01,
+    'high': 0.002,
+}
+
+Point = Tuple[int, int]
+
+@lru_cache(maxsize=None)
+def load_geojson(name:str, level:str='medium') -> dict:
+    """
+    Return the GeoJSON of the given map (see MAPS), at the given level of detail (see LEVELS, or 'full').
+    Loaded once per process, from the pre-simplified file if available.
+    """
+    if level == 'full':
+        with open(MAPS[name], encoding='utf-8') as f:
+            return json.load(f)
+
+    path = simplified_path(name, level)
+    if not path.exists():
+        logging.warning(f'No {path}, simplifying {MAPS[name]} (run python -m src.app_utils.geo_assets).')
+        return decode_geometries(simplify_geojson(load_geojson(name, 'full'), LEVELS[level]))
+
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        return decode_geometries(json.load(f))
+
+def simplified_path(name:str, level:str) -> Path:
+    return SIMPLIFIED_DIR / f'{name}.{level}.json.gz'
+
+def build_simplified_maps() -> None:
+    SIMPLIFIED_DIR.mkdir(parents=True, exist_ok=True)
+    for name in MAPS:
+        geojson = load_geojson(name, 'full')
+        for level, tolerance in LEVELS.items():
+            compact = simplify_geojson(geojson, tolerance)
+            with gzip.open(simplified_path(name, level), 'wt', encoding='utf-8') as f:
+                json.dump(compact, f, separators=(',', ':'), ensure_ascii=False)
+            logging.info(f'Simplified {name} ({level}): {count_vertices(compact)} vertices.')
+
+def simplify_geojson(geojson:dict, tolerance:float) -> dict:
+    """
+    Simplify all polygons of a GeoJSON feature collection,
+    returning the compact format: quantized & delta-encoded rings (see decode_geometries).
+    """
+    features = [(f['properties'], f['geometry']['type'], polygons(f['geometry'])) for f in geojson['features']]
+    rings = [quantize_ring(ring) for _, _, polys in features for poly in polys for ring in poly]
+    junctions = find_junctions(rings)
+    arcs: Dict[Tuple[Point, ...], List[Point]] = {}
+    tolerance_q = tolerance * QUANTIZATION
+
+    compact_features, ring_iter = [], iter(rings)
+    for properties, geometry_type, polys in features:
+        compact_polys = []
+        for poly in polys:
+            compact_poly = []
+            for i in range(len(poly)):
+                ring = simplify_ring(next(ring_iter), junctions, arcs, tolerance_q)
+                if len(ring) >= 4:
+                    compact_poly.append(delta_encode(ring))
+                elif i == 0:
+                    break # Outer ring collapsed: drop polygon (i.e. islands below tolerance)
+            if compact_poly:
+                compact_polys.append(compact_poly)
+        compact_features.append({'properties': properties, 'type': geometry_type, 'polygons': compact_polys})
+
+    return {'quantization': QUANTIZATION, 'features': compact_features}
+
+def decode_geometries(compact:dict) -> dict:
+    features = []
+    for feature in compact['features']:
+        polys = [[delta_decode(ring, compact['quantization']) for ring in poly] for poly in feature['polygons']]
+        if feature['type'] == 'Polygon' and len(polys) == 1:
+            geometry = {'type': 'Polygon', 'coordinates': polys[0]}
+        else:
+            geometry = {'type': 'MultiPolygon', 'coordinates': polys}
+        features.append({'type': 'Feature', 'properties': feature['properties'], 'geometry': geometry})
+
+    return {'type': 'FeatureCollection', 'features': features}
+
+def polygons(geometry:dict) -> list:
+    return [geometry['coordinates']] if geometry['type'] == 'Polygon' else geometry['coordinates']
+
+def quantize_ring(ring:list) -> List[Point]:
+    """
+    Snap a ring to the quantization grid, as an open ring (no repeated closing point) without duplicate points.
+    """
+    points = []
+    for x, y in ring:
+        point = (round(x * QUANTIZATION), round(y * QUANTIZATION))
+        if not points or point != points[-1]:
+            points.append(point)
+    if len(points) > 1 and points[0] == points[-1]:
+        points.pop()
+    return points
+
+def find_junctions(rings:List[List[Point]]) -> set:
+    """
+    Points where borders meet or split, i.e. shared points whose neighbours differ from one ring to another.
+    """
+    neighbours: Dict[Point, frozenset] = {}
+    junctions = set()
+    for ring in rings:
+        for i, point in enumerate(ring):
+            pair = frozenset((ring[i - 1], ring[(i + 1) % len(ring)]))
+            if neighbours.setdefault(point, pair) != pair:
+                junctions.add(point)
+    return junctions
+
+def simplify_ring(ring:List[Point], junctions:set, arcs:dict, tolerance:float) -> List[Point]:
+    """
+    Split a ring into arcs at its junctions, simplify each arc, and return the closed simplified ring.
+    """
+    if len(ring) < 3:
+        return ring
+    starts = [i for i, point in enumerate(ring) if point in junctions]
+    if not starts:
+        # Ring shares no border: split it in two at its furthest point, so it can't collapse to a line
+        far = max(range(len(ring)), key=lambda i: (ring[i][0] - ring[0][0]) ** 2 + (ring[i][1] - ring[0][1]) ** 2)
+        starts = [0, far]
+
+    ring = ring[starts[0]:] + ring[:starts[0]] # Start on a junction
+    starts = [i - starts[0] for i in starts] + [len(ring)]
+    closed = ring + ring[:1]
+
+    simplified = []
+    for start, stop in zip(starts[:-1], starts[1:]):
+        simplified.extend(simplify_arc(closed[start:stop + 1], arcs, tolerance)[:-1])
+    return simplified + simplified[:1]
+
+def simplify_arc(arc:List[Point], arcs:dict, tolerance:float) -> List[Point]:
+    """
+    Douglas-Peucker simplification of an arc, computed once per arc whichever direction it is traversed in.
+    """
+    key = tuple(arc)
+    reverse_key = key[::-1]
+    if key in arcs:
+        return arcs[key]
+    if reverse_key in arcs:
+        return arcs[reverse_key][::-1]
+
+    canonical = min(key, reverse_key)
+    simplified = douglas_peucker(list(canonical), tolerance)
+    arcs[canonical] = simplified
+    return simplified if canonical == key else simplified[::-1]
+
+def douglas_peucker(points:List[Point], tolerance:float) -> List[Point]:
+    keep = [False] * len(points)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(points) - 1)]
+    while stack:
+        first, last = stack.pop()
+        (x1, y1), (x2, y2) = points[first], points[last]
+        dx, dy = x2 - x1, y2 - y1
+        norm = (dx * dx + dy * dy) ** 0.5
+        max_dist, index = 0.0, None
+        for i in range(first + 1, last):
+            x, y = points[i]
+            if norm:
+                dist = abs(dy * (x - x1) - dx * (y - y1)) / norm
+            else:
+                dist = ((x - x1) ** 2 + (y - y1) ** 2) ** 0.5
+            if dist > max_dist:
+                max_dist, index = dist, i
+        if index is not None and max_dist > tolerance:
+            keep[index] = True
+            stack.extend([(first, index), (index, last)])
+    return [point for point, kept in zip(points, keep) if kept]
+
+def delta_encode(ring:List[Point]) -> List[int]:
+    encoded, previous = [], (0, 0)
+    for x, y in ring:
+        encoded.extend((x - previous[0], y - previous[1]))
+        previous = (x, y)
+    return encoded
+
+def delta_decode(encoded:List[int], quantization:int) -> List[List[float]]:
+    ring, x, y = [], 0, 0
+    for i in range(0, len(encoded), 2):
+        x, y = x + encoded[i], y + encoded[i + 1]
+        ring.append([x / quantization, y / quantization])
+    return ring
+
+def count_vertices(compact:dict) -> int:
+    return sum(len(ring) // 2 for feature in compact['features'] for poly in feature['polygons'] for ring in poly)
+
+if __name__=="__main__":
+    build_simplified_maps()
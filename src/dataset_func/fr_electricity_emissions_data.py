@@ -1,30 +1,15 @@
 import pandas as pd
-from enum import Enum
 from typing import Dict
 
 from src.utils.cleaning_utils import clean_FR_dates
-from src.db.db_queries import upload_data
+from src.db.db_dims import Dimension
 
 DB_TABLE = 'World_electricity_emissions'
-
-def import_fr_electricity_emissions_data(full_dataset:pd.DataFrame, db_dims:Dict[str,Enum]) -> None:
-    data = retrieve_fr_electricity_emissions_data(full_dataset)
-    data = clean_fr_electricity_emissions_data(data)
-    data = prep_fr_electricity_emissions_data(data, db_dims)
-    upload_data(data, DB_TABLE)
+CATEGORY = 'Electricité > Mix réseau électrique > France continentale > Moyen'
 
 def retrieve_fr_electricity_emissions_data(data:pd.DataFrame) -> pd.DataFrame:
-    # Split main categories
-    data[['Cat1', 'Cat2', 'Cat3', 'Cat4', 'Cat5', 'Cat6']] = data["Code de la catégorie"].str.split(" > ", expand=True)
-    
-    # Find FR electricity mix data
-    electricity_data = data[data['Cat1']=="Electricité"]
-    elec_mix_data = electricity_data[electricity_data['Cat2']=="Mix réseau électrique"]
-    electricity_data = data[data['Cat1']=="Electricité"]
-    elec_mix_data = electricity_data[electricity_data['Cat2']=="Mix réseau électrique"]
-    fr_elec_emissions_data = elec_mix_data[elec_mix_data['Cat3']=="France continentale"]
-    fr_elec_emissions_data = fr_elec_emissions_data[fr_elec_emissions_data['Cat4']=="Moyen"]
-    fr_elec_emissions_data = fr_elec_emissions_data[fr_elec_emissions_data['Nom attribut français']=='mix moyen'].copy()
+    # Find FR electricity mix data (rows already partitioned on CATEGORY, see CategoryPartitioner)
+    fr_elec_emissions_data = data[data['Nom attribut français']=='mix moyen'].copy()
     
     return fr_elec_emissions_data
 
@@ -39,32 +24,32 @@ def clean_fr_electricity_emissions_data(data:pd.DataFrame) -> pd.DataFrame:
     clean_df['source_name'] = data['Source']
     clean_df['uncertainty'] = data['Incertitude']
     clean_df['creation_date'] = clean_FR_dates(data['Date de modification'], input_format='%B %Y')
-    clean_df['modified_date'] = clean_FR_dates(data['Date de modification'], input_format='%B %Y')
+    clean_df['modified_date'] = clean_df['creation_date'] # Same source column, no need to parse twice
     
     return clean_df.sort_values('validity_date')
 
-def prep_fr_electricity_emissions_data(data:pd.DataFrame, db_dims:Dict[str, Enum]) -> pd.DataFrame:
+def prep_fr_electricity_emissions_data(data:pd.DataFrame, db_dims:Dict[str,Dimension]) -> pd.DataFrame:
     """
     Given all required regional_heat_data as str, find the relevant foreign key ids from db.
-    These functions make use of the DB dimension enums, and through a lambda function which 
-    returns the enum name (table_id) for the first enum.value match.
+    These functions make use of the DB dimensions, which resolve each distinct value to its
+    table_id in a single hash lookup (unresolved values are reported in bulk).
     """
     # Find country_ids
     Countries = db_dims['Countries']
-    data['country_iso_3'] = data['fr_country_name'].apply(lambda x: next((enum.name for enum in Countries if enum.value == x), None))
+    data['country_iso_3'] = Countries.resolve(data['fr_country_name'])
     
     # Find elec_mix_post_type_id
     Elec_mix_post_types = db_dims['Elec_mix_post_types']
-    data['post_type_id'] = data['post_type_name'].apply(lambda x: next((enum.name for enum in Elec_mix_post_types if enum.value == x), None))
+    data['post_type_id'] = Elec_mix_post_types.resolve(data['post_type_name'])
 
     
     # Find unit_ids
     Units = db_dims['Units']
-    data['unit_id'] = data['unit_name'].apply(lambda x: next((enum.name for enum in Units if enum.value == x), None))
+    data['unit_id'] = Units.resolve(data['unit_name'])
     
     # Find source_ids
     Sources = db_dims['Sources']
-    data['source_id'] = data['source_name'].apply(lambda x: next((enum.name for enum in Sources if enum.value == x), None))
+    data['source_id'] = Sources.resolve(data['source_name'])
         
     db_data = data[['country_iso_3', 'post_type_id', 'emissions', 'unit_id','uncertainty', 
                     'creation_date','modified_date','validity_date', 'source_id']].copy()
@@ -1,39 +1,33 @@
 import pandas as pd
-from enum import Enum
 from typing import Dict
 
 from src.utils.cleaning_utils import clean_FR_dates, update_FR_region_names
-from src.db.db_queries import fetch_all_from_table, upload_data
+from src.db.db_dims import Dimension
+from src.db.db_queries import fetch_all_from_table
 
 DB_TABLE = 'FR_forestry_area'
-
-def import_FR_forestry_area_data(full_dataset:pd.DataFrame, db_dims:Dict[str,Enum]) -> None:
-    data = retrieve_FR_forestry_area_data(full_dataset)
-    data = clean_FR_forestry_area_data(data)
-    data = prep_FR_forestry_area_data(data, db_dims)
-    upload_data(data, DB_TABLE)
+CATEGORY = '* > Forêts françaises'
 
 def retrieve_FR_forestry_area_data(data:pd.DataFrame) -> pd.DataFrame:
-    # Split main categories
-    data[['Cat1', 'Cat2', 'Cat3', 'Cat4', 'Cat5', 'Cat6']] = data["Code de la catégorie"].str.split(" > ", expand=True)
-    
-    # FR regional forestry area data
-    sliced_df = data[data['Cat2']=="Forêts françaises"].copy()
+    # FR regional forestry area data (rows already partitioned on CATEGORY, see CategoryPartitioner)
+    sliced_df = data.copy()
     sliced_df.dropna(axis=1, how='all', inplace=True)
     
-    sliced_df = sliced_df.drop(columns=["Type Ligne", "Identifiant de l'élément", "Structure", "Statut de l'élément",
+    sliced_df = sliced_df.drop(columns=["Type Ligne", "Structure", "Statut de l'élément",
                                         "Code de la catégorie", "Programme", "Url du programme", "Transparence",
                                         "Cat1", "Cat2", "Qualité", "Qualité TeR", "Qualité GR", "Qualité TiR",
-                                        "Qualité C", "Qualité P", "Qualité M"])
+                                        "Qualité C", "Qualité P", "Qualité M"],
+                                errors='ignore') # Only read if in the source schema (see SOURCE_SCHEMA)
     
     return sliced_df
 
 def clean_FR_forestry_area_data(data:pd.DataFrame) -> pd.DataFrame():
     clean_df = pd.DataFrame()
 
+    clean_df['element_id'] = data["Identifiant de l'élément"]
     clean_df['region_name'] = data['Nom frontière français']
     clean_df['region_name'] = update_FR_region_names(clean_df['region_name'])
-    clean_df = clean_df[clean_df["region_name"] != "France"] # Remove country from dataset (only FR regions)
+    clean_df = clean_df[clean_df["region_name"].notna()] # Remove country ('France') from dataset (only FR regions)
     
     clean_df['tree_type_name'] = data['Nom attribut français'].replace({'Conifère':"Coniferous",
                                                                         'Feuillu': "Deciduous",
@@ -57,33 +51,33 @@ def clean_FR_forestry_area_data(data:pd.DataFrame) -> pd.DataFrame():
     
     return clean_df
 
-def prep_FR_forestry_area_data(data:pd.DataFrame, db_dims:Dict[str,Enum]) -> pd.DataFrame:
+def prep_FR_forestry_area_data(data:pd.DataFrame, db_dims:Dict[str,Dimension]) -> pd.DataFrame:
     """
     Given all required regional_heat_data as str, find the relevant foreign key ids from db.
-    These functions make use of the DB dimension enums, and through a lambda function which 
-    returns the enum name (table_id) for the first enum.value match.
+    These functions make use of the DB dimensions, which resolve each distinct value to its
+    table_id in a single hash lookup (unresolved values are reported in bulk).
     """
     # Find dept_ids
     Regions = db_dims['Regions']
-    data['region_id'] = data['region_name'].apply(lambda x: next((enum.name for enum in Regions if enum.value == x), None))
+    data['region_id'] = Regions.resolve(data['region_name'])
     
     # Find forest_type_id
     Forest_types = db_dims['Forest_types']
-    data['forest_type_id'] = data['forest_type_name'].apply(lambda x: next((enum.name for enum in Forest_types if enum.value == x), None))
+    data['forest_type_id'] = Forest_types.resolve(data['forest_type_name'])
     
     # Find tree_type_id
     Tree_types = db_dims['Tree_types']
-    data['tree_type_id'] = data['tree_type_name'].apply(lambda x: next((enum.name for enum in Tree_types if enum.value == x), None))
+    data['tree_type_id'] = Tree_types.resolve(data['tree_type_name'])
 
     # Find unit_ids
     Units = db_dims['Units']
-    data['unit_id'] = data['unit_name'].apply(lambda x: next((enum.name for enum in Units if enum.value == x), None))
+    data['unit_id'] = Units.resolve(data['unit_name'])
     
     # Find source_ids
     Sources = db_dims['Sources']
-    data['source_id'] = data['source_name'].apply(lambda x: next((enum.name for enum in Sources if enum.value == x), None)) 
+    data['source_id'] = Sources.resolve(data['source_name']) 
     
-    db_data = data[['region_id', 'forest_type_id', 'tree_type_id', 'land_loss', 'unit_id','uncertainty', 
+    db_data = data[['region_id', 'element_id', 'forest_type_id', 'tree_type_id', 'land_loss', 'unit_id','uncertainty', 
                     'creation_date','modified_date','validity_date', 'source_id']].copy()
         
     return db_data
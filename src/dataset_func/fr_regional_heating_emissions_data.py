@@ -1,62 +1,64 @@
+import numpy as np
 import pandas as pd
-from enum import Enum
-from typing import Dict
+from typing import Dict, List, Optional
 
 from src.utils.cleaning_utils import clean_FR_dates, update_FR_region_names
-from src.db.db_queries import fetch_all_from_table, upload_data
+from src.db.db_dims import Dimension
+from src.db.db_queries import fetch_all_from_table
 
 DB_TABLE = 'FR_regional_heating_emissions'
+CATEGORY = 'Réseaux de chaleur / froid'
 
-def import_fr_regional_heating_emissions_data(full_dataset:pd.DataFrame, db_dims:Dict[str,Enum]) -> None:
-    data = retrieve_fr_regional_heating_emissions_data(full_dataset)
-    data = clean_fr_regional_heating_emissions_data(data)
-    data = prep_fr_regional_heating_emissions_data(data, db_dims)
-    upload_data(data, DB_TABLE)
+# Groups whose mean replaces zero emissions, from finest to coarsest (see impute_zero_emissions)
+IMPUTATION_KEYS = ['dept_id', 'validity_date']
 
 def retrieve_fr_regional_heating_emissions_data(data:pd.DataFrame) -> pd.DataFrame:
-    # Split main categories
-    data[['Cat1', 'Cat2', 'Cat3', 'Cat4', 'Cat5', 'Cat6']] = data["Code de la catégorie"].str.split(" > ", expand=True)
-    
-    # FR regional heat data
-    regional_heat_data = data[data['Cat1']=="Réseaux de chaleur / froid"].copy()
+    # FR regional heat data (rows already partitioned on CATEGORY, see CategoryPartitioner)
+    regional_heat_data = data.copy()
     
     return regional_heat_data
 
-def clean_fr_regional_heating_emissions_data(data:pd.DataFrame) -> pd.DataFrame:
-    clean_df = pd.DataFrame()    
+def clean_fr_regional_heating_emissions_data(data:pd.DataFrame, imputation_keys:Optional[List[str]]=None) -> pd.DataFrame:
+    """
+    Vectorized cleaning (no per-row python): string columns through the .str accessors,
+    and zero emissions imputed with their group's mean (see impute_zero_emissions), by imputation_keys (default IMPUTATION_KEYS).
+    """
+    imputation_keys = list(imputation_keys or IMPUTATION_KEYS)
+    clean_df = pd.DataFrame(index=data.index)
+    
+    # Source element (network) id
+    clean_df['element_id'] = data["Identifiant de l'élément"]
     
     # Country
-    clean_df['country'] = data['Localisation géographique'].apply(lambda x: x.split()[0])
+    clean_df['country'] = data['Localisation géographique'].str.split(n=1).str[0]
     
     # Region
-    data.loc[data["Sous-localisation géographique français"].isna(), "Sous-localisation géographique français"] = 'Corse, Corte' # From data-explore
-    clean_df['region'] = data['Sous-localisation géographique français'].apply(lambda x: x.split(',')[0]) # Take only region-name
+    sub_location = data["Sous-localisation géographique français"].fillna('Corse, Corte') # From data-explore
+    clean_df['region'] = sub_location.str.split(',', n=1).str[0] # Take only region-name
     clean_df['region'] = update_FR_region_names(clean_df['region'])
     
     # Split into dept, city and addresses
-    clean_df[['dept_id', 'city', 'address', 'address2']] = data['Nom attribut français'].str.split(', ', expand=True)
+    clean_df[['dept_id', 'city', 'address', 'address2']] = data['Nom attribut français'].str.split(', ', n=3, expand=True).reindex(columns=range(4))
     clean_df['dept_id'] = clean_df['dept_id'].str.zfill(2) # Changes id from '1' to '01'
     clean_df['address'] = clean_df['address'].str.cat(clean_df['address2'], sep=' ', na_rep='') # Concat & remove as only 2 val
     clean_df.drop(columns={'address2'}, inplace=True)
     
     
     # Heat_cycle (shorten value)
-    clean_df['heat_cycle'] = data['Nom base français'].apply(lambda x: 'heat' if 'chaleur' in x else 'cool')
+    clean_df['heat_cycle'] = np.where(data['Nom base français'].str.contains('chaleur', regex=False, na=False), 'heat', 'cool')
     
     # Format Dates
     clean_df['creation_date'] = clean_FR_dates(data['Date de création'], input_format='%B %Y')
     clean_df['modified_date'] = clean_FR_dates(data['Date de modification'], input_format='%B %Y')
-    clean_df['validity_date'] = pd.to_datetime(data['Période de validité'].apply(lambda x: x.replace('Année ', '')), format='%Y')
+    clean_df['validity_date'] = pd.to_datetime(data['Période de validité'].str.replace('Année ', '', regex=False), format='%Y')
     
     # Archive status
     # TODO: Create general 'status' function to check for other possible 'Status' values - only two values in this subset: ['Archivé' 'Valide générique']
     #       This can also be referring to a db_table dedicated to archive/live status
-    clean_df['archived'] = data["Statut de l'élément"].apply(lambda x: True if x=='Archivé' else False)
+    clean_df['archived'] = data["Statut de l'élément"] == 'Archivé'
     
     # Emmission values
-    clean_df['emissions'] = data['Total poste non décomposé']
-    dept_mean_emissions = clean_df[clean_df['emissions'] != 0].groupby('dept_id')['emissions'].mean() # TODO: Also filter by validity_date
-    clean_df['emissions'] = clean_df.apply(lambda x: dept_mean_emissions[x['dept_id']] if x['emissions'] == 0 else x['emissions'], axis=1)
+    clean_df['emissions'] = impute_zero_emissions(data['Total poste non décomposé'], clean_df[imputation_keys])
     
     # Uncertainty values
     clean_df['uncertainty'] = data['Incertitude']
@@ -69,24 +71,40 @@ def clean_fr_regional_heating_emissions_data(data:pd.DataFrame) -> pd.DataFrame:
     
     return clean_df 
 
-def prep_fr_regional_heating_emissions_data(data:pd.DataFrame, db_dims:Dict[str,Enum]) -> pd.DataFrame:
+def impute_zero_emissions(emissions:pd.Series, keys:pd.DataFrame) -> pd.Series:
+    """
+    Replace zero emissions (i.e. not reported) by the mean of the non-zero emissions of their group (e.g. same dept & year),
+    falling back to coarser groups (dropping the last key, e.g. same dept) where a group has no non-zero emissions.
+    Zeros left without any non-zero emissions in their coarsest group are kept.
+    """
+    zeros = emissions == 0
+    reported = emissions.mask(zeros)
+    group_means = pd.Series(np.nan, index=emissions.index)
+    for i in range(len(keys.columns), 0, -1):
+        group_means = group_means.fillna(reported.groupby([keys[key] for key in keys.columns[:i]]).transform('mean'))
+        if group_means[zeros].notna().all():
+            break
+
+    return emissions.mask(zeros, group_means.fillna(emissions))
+
+def prep_fr_regional_heating_emissions_data(data:pd.DataFrame, db_dims:Dict[str,Dimension]) -> pd.DataFrame:
     """
     Given all required regional_heat_data as str, find the relevant foreign key ids from db.
-    These functions make use of the DB dimension enums, and through a lambda function which 
-    returns the enum name (table_id) for the first enum.value match.
+    These functions make use of the DB dimensions, which resolve each distinct value to its
+    table_id in a single hash lookup (unresolved values are reported in bulk).
     """
     # Find dept_ids
     # NA - Already within the dataset
 
     # Find unit_ids
     Units = db_dims['Units']
-    data['unit_id'] = data['unit_name'].apply(lambda x: next((enum.name for enum in Units if enum.value == x), None))
+    data['unit_id'] = Units.resolve(data['unit_name'])
     
     # Find source_ids
     Sources = db_dims['Sources']
-    data['source_id'] = data['source_name'].apply(lambda x: next((enum.name for enum in Sources if enum.value == x), None)) 
+    data['source_id'] = Sources.resolve(data['source_name']) 
     
-    db_data = data[['dept_id', 'heat_cycle', 'emissions', 'unit_id','uncertainty', 
+    db_data = data[['dept_id', 'element_id', 'heat_cycle', 'emissions', 'unit_id','uncertainty', 
                     'creation_date','modified_date','validity_date', 'source_id']].copy()
     
     return db_data
@@ -0,0 +1,84 @@
+"""
+This file contains the refresh of the materialized aggregate tables (see AGGREGATE_TABLES in db_tables.py),
+run at ingest on the rows inserted / updated by upsert_data: only the groups those rows belong to are recomputed,
+so rollups are read in O(groups) by the app & API, and refreshed in O(touched groups' rows) on import.
+"""
+import sqlite3
+import logging
+import pandas as pd
+
+from src.db.db_tables import AGGREGATE_TABLES, NATURAL_KEYS, AggregateTable
+from src.db.db_queries import to_db_records
+from src.db.db_connection import get_connection
+
+logging.basicConfig(level=logging.INFO)
+
+AGGREGATES = ('count', 'sum', 'min', 'max', 'mean')
+
+def refresh_aggregates(table:str, changed_data:pd.DataFrame) -> None:
+    """
+    Given a fact table, and its rows just inserted / updated (as returned by upsert_data),
+    recompute the groups of its aggregate tables these rows belong to.
+    Empty aggregate tables (e.g. new, or added to an existing db) are fully computed instead.
+    """
+    db = get_connection()
+
+    for agg_table, aggregate in AGGREGATE_TABLES.items():
+        if aggregate.table != table:
+            continue
+
+        try:
+            with db:
+                if db.execute(f"SELECT NOT EXISTS (SELECT 1 FROM {agg_table})").fetchone()[0]:
+                    db.execute(full_refresh_query(agg_table, aggregate))
+                    logging.info(f'Computed {agg_table}.')
+                elif not changed_data.empty:
+                    touched_table = load_touched_keys(db, table, changed_data)
+                    db.execute(incremental_refresh_query(agg_table, aggregate, touched_table))
+                    logging.info(f'Refreshed {agg_table} for {len(changed_data)} changed rows.')
+        except sqlite3.OperationalError as e:
+            logging.error(e)
+
+def load_touched_keys(db:sqlite3.Connection, table:str, changed_data:pd.DataFrame) -> str:
+    """
+    Load the natural keys of the changed rows into a temp table (with the fact table's column names & affinities),
+    from which the touched groups are derived.
+    """
+    key = NATURAL_KEYS[table]
+    touched_table = f'temp.Touched_{table}'
+    db.execute(f"CREATE TEMP TABLE IF NOT EXISTS Touched_{table} AS SELECT {', '.join(key)} FROM {table} WHERE false")
+    db.execute(f"DELETE FROM {touched_table}")
+    db.executemany(f"INSERT INTO {touched_table} VALUES ({', '.join('?' * len(key))})", to_db_records(changed_data[key]))
+
+    return touched_table
+
+def aggregate_columns(aggregate:AggregateTable) -> str:
+    value = aggregate.value
+    return f"COUNT({value}), SUM({value}), MIN({value}), MAX({value}), AVG({value})"
+
+def full_refresh_query(agg_table:str, aggregate:AggregateTable) -> str:
+    columns = ', '.join(aggregate.groups)
+    groups = ', '.join(f'{expression} AS {column}' for column, (_, expression) in aggregate.groups.items())
+    return f"""INSERT INTO {agg_table} ({columns}, {', '.join(AGGREGATES)})
+               SELECT {groups}, {aggregate_columns(aggregate)}
+               FROM {aggregate.table}
+               GROUP BY {columns}
+            """
+
+def incremental_refresh_query(agg_table:str, aggregate:AggregateTable, touched_table:str) -> str:
+    """
+    Recompute the touched groups (derived from the touched keys) from all their fact rows.
+    The fact table subquery is flattened by sqlite, so its rows are looked up by group (natural key index),
+    rather than scanned. 'WHERE true' disambiguates the upsert's ON CONFLICT from a join constraint.
+    """
+    columns = ', '.join(aggregate.groups)
+    groups = ', '.join(f'{expression} AS {column}' for column, (_, expression) in aggregate.groups.items())
+    updates = ', '.join(f'{agg}=excluded.{agg}' for agg in AGGREGATES)
+    return f"""INSERT INTO {agg_table} ({columns}, {', '.join(AGGREGATES)})
+               SELECT {columns}, {aggregate_columns(aggregate)}
+               FROM (SELECT DISTINCT {groups} FROM {touched_table})
+               JOIN (SELECT {groups}, {aggregate.value} FROM {aggregate.table}) USING ({columns})
+               WHERE true
+               GROUP BY {columns}
+               ON CONFLICT ({columns}) DO UPDATE SET {updates}
+            """
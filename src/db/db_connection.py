@@ -0,0 +1,79 @@
+"""
+This file contains the shared db connection(s).
+Each thread keeps one long-lived connection per db file (see get_connection),
+configured with WAL journaling and the PRAGMAS below, rather than reconnecting on each query.
+The db file defaults to 'ecoact.db', and can be set with the ECOACT_DB_PATH env variable or set_db_path().
+"""
+import os
+import atexit
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, Tuple
+
+PRAGMAS = {
+    'journal_mode': 'WAL',    # Readers don't block the writer (and vice-versa)
+    'synchronous': 'NORMAL',  # fsync on WAL checkpoints only, safe in WAL mode
+    'cache_size': -64_000,    # 64MB page cache
+    'temp_store': 'MEMORY',
+}
+
+_db_path = os.environ.get('ECOACT_DB_PATH', 'ecoact.db')
+_local = threading.local()
+
+def get_db_path() -> str:
+    return _db_path
+
+def set_db_path(db_path:str) -> None:
+    global _db_path
+    _db_path = str(db_path)
+
+def get_connection(db_path:str=None) -> sqlite3.Connection:
+    """
+    Return this thread's connection to the given db file (default: get_db_path()),
+    opening and configuring it on first use.
+    """
+    db_path = str(db_path or _db_path)
+    connections: Dict[str, sqlite3.Connection] = _local.__dict__.setdefault('connections', {})
+
+    if db_path not in connections:
+        db = sqlite3.connect(db_path)
+        for pragma, value in PRAGMAS.items():
+            db.execute(f"PRAGMA {pragma}={value}")
+        connections[db_path] = db
+
+    return connections[db_path]
+
+def db_uri(db_path:str, query:str) -> str:
+    """
+    SQLite URI of the db file, with the given query (e.g. 'mode=ro'): the absolute path, percent-encoded,
+    so that '?', '#' or '%' in the path are not read as the URI's query, fragment or escapes.
+    """
+    return f'{Path(db_path).resolve().as_uri()}?{query}'
+
+def data_version(db_path:str=None) -> Tuple[int, ...]:
+    """
+    Cheap signature of the db's contents, changing whenever it is written to:
+    the modification time and size of the db file and its WAL (from os.stat, without querying the db).
+    """
+    db_path = str(db_path or _db_path)
+    version = ()
+    for path in (db_path, f'{db_path}-wal'):
+        try:
+            stat = os.stat(path)
+            version += (stat.st_mtime_ns, stat.st_size)
+        except FileNotFoundError:
+            version += (0, 0)
+
+    return version
+
+def close_connections() -> None:
+    """
+    Close all of this thread's connections.
+    """
+    connections = _local.__dict__.get('connections', {})
+    for db in connections.values():
+        db.close()
+    connections.clear()
+
+atexit.register(close_connections)
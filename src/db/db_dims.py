@@ -0,0 +1,59 @@
+import sqlite3
+import logging
+import numpy as np
+import pandas as pd
+from typing import Any, Dict, Iterable, Tuple
+
+logging.basicConfig(level=logging.INFO)
+
+class Dimension:
+    """
+    In-memory copy of a DB dimension table, indexed from value (e.g. 'France') to id (e.g. 'FRA').
+    Used by the prep_* functions to resolve foreign keys on a whole column at once,
+    rather than scanning every dimension entry for each row.
+    """
+
+    def __init__(self, table_name:str, rows:Iterable[Tuple[Any, Any]]) -> None:
+        self.table_name = table_name
+        self.index: Dict[Any, Any] = {}
+        for dim_id, value in rows:
+            self.index.setdefault(value, dim_id) # Keep first id, as per previous enum behaviour
+        self.unresolved: Dict[Any, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def __contains__(self, value:Any) -> bool:
+        return value in self.index
+
+    def __getitem__(self, value:Any) -> Any:
+        return self.index[value]
+
+    def resolve(self, data:pd.Series, strict:bool=False) -> pd.Series:
+        """
+        Given a series of dimension values, return the corresponding series of dimension ids.
+        Each distinct value is only looked up once, and broadcast back via its factorized code.
+        Values not found in the dimension are reported in bulk, and set to None
+        (or raise a ValueError if strict=True).
+        """
+        codes, uniques = pd.factorize(data, use_na_sentinel=True)
+        unique_ids = np.array([self.index.get(value) for value in uniques] + [None], dtype=object)
+
+        missing = pd.isna(unique_ids[:-1])
+        if missing.any():
+            counts = np.bincount(codes[codes >= 0], minlength=len(uniques))
+            unresolved = {value: int(count) for value, count in zip(uniques[missing], counts[missing])}
+            for value, count in unresolved.items():
+                self.unresolved[value] = self.unresolved.get(value, 0) + count
+
+            message = (f'{sum(unresolved.values())} rows of {data.name} could not be resolved '
+                       f'against {self.table_name}: {list(unresolved)}')
+            if strict:
+                raise ValueError(message)
+            logging.warning(message)
+
+        return pd.Series(unique_ids[codes], index=data.index, dtype=object, name=data.name) # code -1 (NA) picks None
+
+def create_dim_from_table(db:sqlite3.Connection, table_name:str, id_column:str, value_column:str) -> Dimension:
+    query = db.execute(f"SELECT {id_column}, {value_column} FROM {table_name}")
+    return Dimension(table_name, query.fetchall())
@@ -0,0 +1,173 @@
+"""
+This file contains the columnar export of the db, run at the end of the ingest (emissions.py --export-parquet),
+and its read path, for analysts loading whole tables without going through sqlite row by row:
+    <export dir>/<snapshot>/<table>/year=<validity year>/part-0.parquet   (fact tables, one dir per dataset table)
+    <export dir>/<snapshot>/<table>/part-0.parquet                        (dimension & aggregate tables)
+    <export dir>/<snapshot>/<table>.arrow                                 (Arrow IPC file, uncompressed, memory-mappable)
+    <export dir>/<snapshot>/manifest.json                                 (row count & digest of each file)
+    <export dir>/LATEST                                                   (name of the latest snapshot)
+Each export is a new snapshot, where files unchanged since the previous snapshot (same content digest)
+are hard links to the previous ones, so snapshots are cheap to keep & version.
+Requires pyarrow, imported on use only.
+"""
+import os
+import json
+import shutil
+import hashlib
+import logging
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from src.db.db_tables import ALL_DB_TABLES, AGGREGATE_TABLES, NATURAL_KEYS, YEAR
+from src.db.db_connection import get_connection
+
+logging.basicConfig(level=logging.INFO)
+
+EXPORT_DIR = Path(os.environ.get('ECOACT_EXPORT_DIR', './exports'))
+DATE_COLUMNS = ('validity_date', 'creation_date', 'modified_date')
+PARTITION_COLUMN = 'year'
+
+def import_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+        import pyarrow.ipc
+    except ImportError as e:
+        raise ImportError('The Parquet/Arrow export requires pyarrow (pip install pyarrow).') from e
+    return pyarrow
+
+def export_snapshot(export_dir:Path=EXPORT_DIR, snapshot:str=None) -> Path:
+    """
+    Export all db tables to a new snapshot of Parquet (partitioned fact tables) & Arrow IPC files,
+    and point LATEST to it.
+    -----------
+    returns:
+        path of the snapshot
+    """
+    pa = import_pyarrow()
+    export_dir = Path(export_dir)
+    snapshot = snapshot or datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S%f') # Several exports may run in the same second
+    snapshot_dir = export_dir / snapshot
+    if snapshot_dir.exists():
+        raise FileExistsError(f'Snapshot {snapshot_dir} already exists.')
+    previous = latest_snapshot(export_dir)
+    previous_manifest = read_manifest(export_dir / previous) if previous else {}
+
+    db = get_connection()
+    tables = [t.__name__ for t in ALL_DB_TABLES] + list(AGGREGATE_TABLES)
+    manifest: Dict[str, Any] = {'snapshot': snapshot, 'files': {}}
+
+    for table in tables:
+        partitioned = table in NATURAL_KEYS
+        data = read_db_table(db, table, partitioned)
+
+        files = {f'{table}.arrow': data.drop(columns=PARTITION_COLUMN) if partitioned else data}
+        if partitioned:
+            for year, partition in data.groupby(PARTITION_COLUMN):
+                files[f'{table}/{PARTITION_COLUMN}={year}/part-0.parquet'] = partition.drop(columns=PARTITION_COLUMN)
+        else:
+            files[f'{table}/part-0.parquet'] = data
+
+        for file, file_data in files.items():
+            digest = content_digest(file_data)
+            manifest['files'][file] = {'rows': len(file_data), 'digest': digest}
+            path = snapshot_dir / file
+            path.parent.mkdir(parents=True, exist_ok=True)
+
+            if previous_manifest.get('files', {}).get(file, {}).get('digest') == digest:
+                link_file(export_dir / previous / file, path)
+                continue
+
+            arrow_table = pa.Table.from_pandas(file_data, preserve_index=False)
+            if file.endswith('.arrow'):
+                with pa.ipc.new_file(path, arrow_table.schema) as writer:
+                    writer.write_table(arrow_table)
+            else:
+                pa.parquet.write_table(arrow_table, path, compression='zstd')
+
+        logging.info(f'Exported {table} ({len(data)} rows).')
+
+    with open(snapshot_dir / 'manifest.json', 'w') as f:
+        json.dump(manifest, f, indent=2)
+    write_latest(export_dir, snapshot)
+    logging.info(f'Exported snapshot {snapshot_dir}.')
+
+    return snapshot_dir
+
+def read_db_table(db, table:str, partitioned:bool) -> pd.DataFrame:
+    """
+    Read a whole db table, with dates as datetimes, and fact tables' validity year (partition column).
+    """
+    year = f", {YEAR} AS {PARTITION_COLUMN}" if partitioned else ''
+    data = pd.read_sql_query(f"SELECT *{year} FROM {table}", db)
+    for col in DATE_COLUMNS:
+        if col in data.columns:
+            data[col] = pd.to_datetime(data[col])
+
+    return data
+
+def content_digest(data:pd.DataFrame) -> str:
+    row_hashes = pd.util.hash_pandas_object(data, index=False).to_numpy()
+    return hashlib.blake2b(row_hashes.tobytes() + ','.join(data.columns).encode(), digest_size=16).hexdigest()
+
+def link_file(source:Path, destination:Path) -> None:
+    try:
+        os.link(source, destination)
+    except OSError:
+        shutil.copy2(source, destination) # e.g. across file systems
+
+def latest_snapshot(export_dir:Path=EXPORT_DIR) -> Optional[str]:
+    try:
+        return (Path(export_dir) / 'LATEST').read_text().strip() or None
+    except FileNotFoundError:
+        return None
+
+def write_latest(export_dir:Path, snapshot:str) -> None:
+    # Replaced atomically, so readers never see a partial pointer
+    tmp_path = Path(export_dir) / 'LATEST.tmp'
+    tmp_path.write_text(snapshot)
+    os.replace(tmp_path, Path(export_dir) / 'LATEST')
+
+def read_manifest(snapshot_dir:Path) -> dict:
+    try:
+        with open(snapshot_dir / 'manifest.json') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+def snapshot_path(export_dir:Path=EXPORT_DIR, snapshot:str=None) -> Path:
+    snapshot = snapshot or latest_snapshot(export_dir)
+    if snapshot is None:
+        raise FileNotFoundError(f'No snapshot in {export_dir} (run: python emissions.py --export-parquet).')
+    return Path(export_dir) / snapshot
+
+def read_parquet_table(table:str, columns:List[str]=None, filters:List[Tuple[str, str, Any]]=None,
+                       export_dir:Path=EXPORT_DIR, snapshot:str=None) -> pd.DataFrame:
+    """
+    Read an exported table (default: from the latest snapshot), as a dataframe.
+        columns: only read these columns (column projection)
+        filters: e.g. [('year', '>=', 2020), ('dept_id', '=', '01')], as in pyarrow.parquet.read_table.
+                 Filters on the year skip whole partitions, other filters skip row groups by their statistics.
+    """
+    pa = import_pyarrow()
+    path = snapshot_path(export_dir, snapshot) / table
+    arrow_table = pa.parquet.read_table(path, columns=columns, filters=filters, partitioning='hive', memory_map=True)
+
+    return arrow_table.to_pandas()
+
+def read_arrow_table(table:str, columns:List[str]=None, export_dir:Path=EXPORT_DIR, snapshot:str=None) -> pd.DataFrame:
+    """
+    Load an exported table (default: from the latest snapshot) from its memory-mapped Arrow IPC file:
+    columns are only paged in from disk as read, and numeric columns (without nulls) are zero-copy.
+    """
+    pa = import_pyarrow()
+    path = snapshot_path(export_dir, snapshot) / f'{table}.arrow'
+    with pa.memory_map(str(path), 'r') as source:
+        arrow_table = pa.ipc.open_file(source).read_all()
+    if columns is not None:
+        arrow_table = arrow_table.select(columns)
+
+    return arrow_table.to_pandas(split_blocks=True, self_destruct=True)
@@ -1,30 +1,115 @@
+import re
 import pandas as pd
 import sqlite3
 import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.db.db_tables import NATURAL_KEYS
+from src.db.db_connection import get_connection
 
 logging.basicConfig(level=logging.INFO)
 
 def upload_data(data:pd.DataFrame, table:str) -> None:
     """
     Given a dataframe with all required data, and column names equal to the db table schema,
-    upload / append new values to given database table.
+    upload / append new values to given database table, in a single transaction.
+    Rows conflicting with a unique value already in the table (e.g. dimension values) are skipped,
+    any other constraint violation (e.g. NOT NULL) raises, rolling back the upload.
     """
-    db = sqlite3.connect('ecoact.db')
+    db = get_connection()
+    columns = list(data.columns)
+    query = f"""INSERT INTO {table} ({', '.join(columns)}) 
+                VALUES ({', '.join('?' * len(columns))})
+                ON CONFLICT DO NOTHING
+            """
+
+    try:
+        changes = db.total_changes
+        with db:
+            db.executemany(query, to_db_records(data))
+        inserted = db.total_changes - changes
+        logging.info(f'Uploaded {inserted} rows to {table} ({len(data) - inserted} already in the table).')
+    except sqlite3.OperationalError as e:
+        logging.error(e)
 
+def upsert_data(data:pd.DataFrame, table:str) -> pd.DataFrame:
+    """
+    Given a dataframe with all required data, and column names equal to the db table schema,
+    insert new rows / update changed rows of a fact table, as identified by its natural key (see NATURAL_KEYS).
+    Rows sharing a natural key are deduplicated first (see drop_duplicate_keys),
+    and each row is stored with a content hash, so rows unchanged since the last import are skipped without any write.
+    -----------
+    returns:
+        df of the inserted / updated rows, with the number of rows unchanged since the last import in attrs['rows_unchanged']
+    """
+    key = NATURAL_KEYS[table]
+    
+    incomplete_key = data[key].isna().any(axis=1)
+    if incomplete_key.any():
+        logging.warning(f'Skipped {incomplete_key.sum()} rows without a complete natural key {key} for {table}.')
+        data = data[~incomplete_key]
+    
+    data = data.assign(row_hash=pd.util.hash_pandas_object(data, index=False).to_numpy().view('int64'))
+    data = drop_duplicate_keys(data, table)
+    
+    db = get_connection()
+    
     try:
-        data.to_sql(table, db, if_exists="append", index=False)
-        logging.info(f'Uploaded data to {table}.')
+        existing_hashes = pd.read_sql_query(f"SELECT row_hash FROM {table}", db)['row_hash']
+        changed_data = data[~data['row_hash'].isin(existing_hashes)]
+        changed_data.attrs['rows_unchanged'] = len(data) - len(changed_data) # e.g. for the ingest's metrics
+        
+        if changed_data.empty:
+            logging.info(f'No changes to upload to {table}.')
+            return changed_data
+        
+        columns = list(changed_data.columns)
+        updates = ', '.join(f'{col}=excluded.{col}' for col in columns if col not in key)
+        query = f"""INSERT INTO {table} ({', '.join(columns)}) 
+                    VALUES ({', '.join('?' * len(columns))})
+                    ON CONFLICT ({', '.join(key)}) DO UPDATE SET {updates}
+                """
+        with db:
+            db.executemany(query, to_db_records(changed_data))
+        logging.info(f'Upserted {len(changed_data)} rows to {table}.')
     except sqlite3.OperationalError as e:
         logging.error(e)
+        changed_data = data.iloc[0:0]
     
-    finally:
-        db.close()
+    return changed_data
+
+def drop_duplicate_keys(data:pd.DataFrame, table:str) -> pd.DataFrame:
+    """
+    Keep a single row per natural key, as only one can be stored: the latest modified (then created) row,
+    ties being broken on the row hash, so the row kept never depends on the order of the export.
+    """
+    key = NATURAL_KEYS[table]
+    order = [column for column in ('modified_date', 'creation_date') if column in data.columns] + ['row_hash']
+    data = data.sort_values(order, kind='stable', na_position='first')
+    duplicated = data.duplicated(key, keep='last')
+    if duplicated.any():
+        logging.warning(f'Dropped {duplicated.sum()} rows sharing a natural key {key} with a later row for {table}.')
+        data = data[~duplicated]
+
+    return data
+
+def to_db_records(data:pd.DataFrame) -> List[Tuple]:
+    """
+    Convert a dataframe into rows of python values sqlite3 can bind,
+    with dates formatted as pd.to_sql does, and NaN/NaT as None.
+    """
+    data = data.copy()
+    for col in data.select_dtypes(include=['datetime', 'datetimetz']).columns:
+        data[col] = data[col].dt.strftime('%Y-%m-%d %H:%M:%S')
+    data = data.astype(object).where(data.notna(), None)
+    
+    return list(data.itertuples(index=False, name=None))
 
 def fetch_all_from_table(table:str) -> pd.DataFrame:
     """
     Given a db SQL table, return all results as a dataframe.
     """
-    db = sqlite3.connect('ecoact.db')
+    db = get_connection()
     
     try:
         query = f"SELECT * FROM {table}"
@@ -40,8 +125,62 @@ def fetch_all_from_table(table:str) -> pd.DataFrame:
         logging.info(f'Fetch from {table} successful.')
     except sqlite3.OperationalError as e:
         logging.error(e)
-    
-    finally:
-        db.close()
         
     return df
+
+IDENTIFIER = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
+AGGREGATES = ('AVG', 'SUM', 'MIN', 'MAX', 'COUNT')
+
+def build_query(table:str, columns:List[str], joins:Optional[Dict[str, str]]=None, filters:Optional[Dict[str, Any]]=None,
+                aggregates:Optional[Dict[str, Tuple[str, str]]]=None) -> Tuple[str, List[Any]]:
+    """
+    Build a single parameterized SELECT statement on a (fact) table:
+        columns: selected columns, also grouped by if any aggregates
+        joins: {dimension table: join key column}, joined with LEFT JOIN ... USING (key)
+        filters: {column: value}, as column = ?, or column IN (?, ...) for a list/tuple of values
+        aggregates: {alias: (function, column)}, e.g. {'emissions': ('AVG', 'emissions')}
+    Identifiers are validated (as they can't be bound as parameters), values are always bound.
+    -----------
+    returns:
+        (query, params)
+    """
+    joins, filters, aggregates = joins or {}, filters or {}, aggregates or {}
+    identifiers = [table, *columns, *joins, *joins.values(), *filters, *aggregates,
+                   *(column for _, column in aggregates.values())]
+    invalid = [identifier for identifier in identifiers if not IDENTIFIER.match(identifier)]
+    if invalid:
+        raise ValueError(f'Invalid identifiers: {invalid}')
+    invalid = [func for func, _ in aggregates.values() if func.upper() not in AGGREGATES]
+    if invalid:
+        raise ValueError(f'Invalid aggregate functions: {invalid} (expected one of {AGGREGATES})')
+
+    selected = [*columns, *(f'{func.upper()}({column}) AS {alias}' for alias, (func, column) in aggregates.items())]
+    query = f"SELECT {', '.join(selected)} FROM {table}"
+    query += ''.join(f" LEFT JOIN {dim_table} USING ({key})" for dim_table, key in joins.items())
+
+    conditions, params = [], []
+    for column, value in filters.items():
+        if isinstance(value, (list, tuple)):
+            conditions.append(f"{column} IN ({', '.join('?' * len(value))})")
+            params.extend(value)
+        else:
+            conditions.append(f"{column} = ?")
+            params.append(value)
+    if conditions:
+        query += f" WHERE {' AND '.join(conditions)}"
+    if aggregates and columns:
+        query += f" GROUP BY {', '.join(columns)}"
+
+    return query, params
+
+def fetch_query(table:str, columns:List[str], joins:Optional[Dict[str, str]]=None, filters:Optional[Dict[str, Any]]=None,
+                aggregates:Optional[Dict[str, Tuple[str, str]]]=None) -> pd.DataFrame:
+    """
+    Given a db SQL table, return the selected (joined, filtered, aggregated) results as a dataframe (see build_query),
+    so only the result rows are transferred from the db.
+    """
+    query, params = build_query(table, columns, joins, filters, aggregates)
+    df = pd.read_sql_query(query, get_connection(), params=params)
+    logging.info(f'Fetch from {table} successful ({len(df)} rows).')
+    
+    return df
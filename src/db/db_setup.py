@@ -1,35 +1,83 @@
 import sqlite3
 import logging
 import pandas as pd
-from typing import List, Dict, Callable
-from enum import Enum
+from typing import List, Dict, Callable, Tuple
 
 from src.utils.cleaning_utils import update_FR_region_names
+from src.utils.source_utils import load_source
 from src.db.db_queries import upload_data
+from src.db.db_connection import get_connection
+from src.db.db_dims import Dimension, create_dim_from_table
 
-from src.db.db_tables import ALL_DB_TABLES
+from src.db.db_tables import ALL_DB_TABLES, AGGREGATE_TABLES, NATURAL_KEYS, aggregate_tables, all_db_indexes
 
 logging.basicConfig(level=logging.INFO)
 
 def create_db(tables:List[Callable[[None], str]]=ALL_DB_TABLES) -> None:
     """
-    Creating all dimension and fact DB tables.
+    Creating all dimension and fact DB tables, in a single transaction.
+    Fact tables of an existing db created with a previous schema are rebuilt first (see outdated_fact_tables).
     """
     
-    db = sqlite3.connect('ecoact.db')
+    db = get_connection()
     c = db.cursor()
+    c.execute("BEGIN")
+
+    # Previous fact rows can't be given their natural key (e.g. element_id), so are re-imported from the source export
+    for table in outdated_fact_tables(db, tables):
+        logging.warning(f'Rebuilding {table}, created with a previous schema: its rows are re-imported.')
+        c.execute(f"DROP TABLE {table}")
+        for agg_table, aggregate in AGGREGATE_TABLES.items():
+            if aggregate.table == table:
+                c.execute(f"DROP TABLE IF EXISTS {agg_table}") # Recomputed once the fact table is imported
 
     for t in tables:
         try:
             c.execute(t())
-            db.commit()
             logging.info(f'Created {t.__name__} table.')
         except sqlite3.OperationalError as e:
             logging.error(f'Skipped {e}.')
     
-    db.close()
+    # Materialized aggregates of the fact tables,
+    # unique natural keys, so re-imports update rather than duplicate fact rows,
+    # and covering indexes for the API lookups
+    for statement in aggregate_tables() + all_db_indexes():
+        try:
+            c.execute(statement)
+        except sqlite3.OperationalError as e:
+            logging.error(f'Skipped {e}.')
+    db.commit()
 
-def init_db_dim_data() -> None:
+def table_columns(db:sqlite3.Connection, table:str) -> List[Tuple[str, str, int]]:
+    return [(name, type_, notnull) for _, name, type_, notnull, _, _ in db.execute(f"PRAGMA table_info({table})")]
+
+def outdated_fact_tables(db:sqlite3.Connection, tables:List[Callable[[None], str]]=ALL_DB_TABLES) -> List[str]:
+    """
+    Fact tables of the db whose columns differ from their current schema
+    (e.g. created before natural keys & row hashes, see NATURAL_KEYS).
+    """
+    schema = sqlite3.connect(':memory:')
+    outdated = []
+    for t in tables:
+        table = t.__name__
+        columns = table_columns(db, table)
+        if table not in NATURAL_KEYS or not columns:
+            continue
+        schema.execute(t())
+        if columns != table_columns(schema, table):
+            outdated.append(table)
+    schema.close()
+
+    return outdated
+
+def init_db_dim_data(units:List[str]=None, sources:List[str]=None) -> None:
+    """
+    Upload all dimension values. Units & sources are collected from the source export while it is read
+    (see read_source), or else loaded from it here (from the parsed source cache if unchanged).
+    """
+    if units is None or sources is None:
+        source = load_source([])
+        units, sources = source.units, source.sources
     
     # Countries                                                         # Namibia's acronym is 'NA'
     countries = pd.read_csv('./data/countries.csv', encoding='latin-1', keep_default_na=False) 
@@ -45,12 +93,11 @@ def init_db_dim_data() -> None:
     upload_data(fr_dept_dims, "Dim_Departments")
     
     # Units - TODO: Clean unique units
-    data = pd.read_csv('./data/donnees_candidats_dev_python.csv', encoding='latin-1')
-    units = pd.DataFrame(data['Unité français'].unique()).rename(columns={0:'unit_name'})
+    units = pd.DataFrame({'unit_name': units})
     upload_data(units.astype(str), "Dim_Units")
     
     # Sources - TODO: Clean unique sources
-    sources = pd.DataFrame(data['Source'].unique()).rename(columns={0:'source_name'}) # TODO: To add source_url if avaiable
+    sources = pd.DataFrame({'source_name': sources}) # TODO: To add source_url if avaiable
     upload_data(sources.astype(str), "Dim_Sources")
 
     # Electricity mix source type
@@ -92,18 +139,22 @@ def prep_FR_dept_dim_data() -> pd.DataFrame:
     
     return dept_dims
 
-def retrieve_db_dim_data() -> Dict[str, Enum]:
+def retrieve_db_dim_data() -> Dict[str, Dimension]:
+    """
+    Retrieves all DB dimension tables, each indexed from value to id
+    for foreign key lookups (see Dimension.resolve).
+    """
 
-    db = sqlite3.connect('ecoact.db')
+    db = get_connection()
 
-    Countries = create_enum_from_table(db, 'Dim_Countries', 'iso_3', 'fr_country_name')
-    Departments = create_enum_from_table(db, 'Dim_Departments', 'dept_id', 'dept_name')
-    Regions = create_enum_from_table(db, 'Dim_Regions', 'region_id', 'region_name')
-    Elec_mix_post_type = create_enum_from_table(db, 'Dim_Elec_mix_post_types', 'post_type_id', 'post_type_name')
-    Sources = create_enum_from_table(db, 'Dim_Sources', 'source_id', 'source_name')
-    Units = create_enum_from_table(db, 'Dim_Units', 'unit_id', 'unit_name')
-    Tree_types = create_enum_from_table(db, 'Dim_Tree_types', 'tree_type_id', 'tree_type_name')
-    Forest_types = create_enum_from_table(db, 'Dim_Forest_types', 'forest_type_id', 'forest_type_name')
+    Countries = create_dim_from_table(db, 'Dim_Countries', 'iso_3', 'fr_country_name')
+    Departments = create_dim_from_table(db, 'Dim_Departments', 'dept_id', 'dept_name')
+    Regions = create_dim_from_table(db, 'Dim_Regions', 'region_id', 'region_name')
+    Elec_mix_post_type = create_dim_from_table(db, 'Dim_Elec_mix_post_types', 'post_type_id', 'post_type_name')
+    Sources = create_dim_from_table(db, 'Dim_Sources', 'source_id', 'source_name')
+    Units = create_dim_from_table(db, 'Dim_Units', 'unit_id', 'unit_name')
+    Tree_types = create_dim_from_table(db, 'Dim_Tree_types', 'tree_type_id', 'tree_type_name')
+    Forest_types = create_dim_from_table(db, 'Dim_Forest_types', 'forest_type_id', 'forest_type_name')
     
     db_dims = {
         'Countries': Countries,
@@ -118,13 +169,6 @@ def retrieve_db_dim_data() -> Dict[str, Enum]:
     
     return db_dims
 
-def create_enum_from_table(db: sqlite3.Connection, table_name: str, name_column: str, value_column: str) -> Enum:
-    query = db.execute(f"SELECT {name_column}, {value_column} FROM {table_name}")
-    result = dict(query.fetchall())
-    result = {str(key): val for key, val in result.items()}
-    dim_enum = Enum(table_name, result)
-    return dim_enum
-
 
 if __name__=="__main__":
     create_db()
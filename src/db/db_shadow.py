@@ -0,0 +1,159 @@
+"""
+This file contains the shadow db of the ingest (see emissions.py): imports are run into a copy of the live db
+(<db file>.shadow), checked (integrity, row counts & aggregates), then copied back into the live db at once
+(see copy_shadow_db), so readers (the API & the app) never see a partial or failed import,
+and only wait on the final copy's commit. Imports that changed nothing are discarded (see shadow_changed).
+"""
+import os
+import sqlite3
+import logging
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+from src.db.db_tables import ALL_DB_TABLES, AGGREGATE_TABLES, NATURAL_KEYS
+from src.db.db_connection import close_connections, db_uri
+
+logging.basicConfig(level=logging.INFO)
+
+COPY_METHODS = ('backup', 'vacuum')
+BUSY_TIMEOUT_S = 30 # Wait on another writer of the live db
+
+def shadow_path(db_path:str) -> str:
+    return f'{db_path}.shadow'
+
+def remove_db_file(path:str) -> None:
+    for file in (path, f'{path}-wal', f'{path}-shm'):
+        Path(file).unlink(missing_ok=True)
+
+def prepare_shadow_db(db_path:str, method:str='backup') -> str:
+    """
+    Create the shadow db as a copy of the live db (if any), so imports only upsert their changes, as in place.
+        method: 'backup' (sqlite backup API, page by page copy) or 'vacuum' (VACUUM INTO, compacted copy)
+    Both copy a consistent state of the live db (committed data only), without blocking its readers.
+    -----------
+    returns:
+        path of the shadow db
+    """
+    if method not in COPY_METHODS:
+        raise ValueError(f'Unknown copy method {method}, expected one of {COPY_METHODS}.')
+
+    shadow = shadow_path(db_path)
+    remove_db_file(shadow) # Left by a failed import
+    if not os.path.exists(db_path):
+        return shadow
+
+    live = sqlite3.connect(db_uri(db_path, 'mode=ro'), uri=True)
+    try:
+        if method == 'vacuum':
+            live.execute("VACUUM INTO ?", (shadow,))
+        else:
+            copy = sqlite3.connect(shadow)
+            live.backup(copy)
+            copy.close()
+    finally:
+        live.close()
+    logging.info(f'Copied {db_path} to {shadow} ({method}).')
+
+    return shadow
+
+def db_schema(db:sqlite3.Connection) -> List[Tuple[str, str, str]]:
+    return db.execute("SELECT type, name, sql FROM sqlite_master ORDER BY type, name").fetchall()
+
+def shadow_changed(shadow:str, db_path:str, changes:int) -> bool:
+    """
+    Whether the import changed the shadow db, i.e. wrote any rows (changes: total_changes of the shadow's connection),
+    or created / rebuilt any table or index (see db_setup.create_db). Unchanged shadows are not copied back,
+    as the copy would change the live db's data version (see db_connection.data_version), dropping readers' caches.
+    """
+    if changes or not os.path.exists(db_path):
+        return True
+
+    shadow_db = sqlite3.connect(db_uri(shadow, 'mode=ro'), uri=True)
+    live = sqlite3.connect(db_uri(db_path, 'mode=ro'), uri=True)
+    try:
+        return db_schema(shadow_db) != db_schema(live)
+    finally:
+        live.close()
+        shadow_db.close()
+
+def discard_shadow_db(shadow:str) -> None:
+    close_connections() # This thread's connections, e.g. to the shadow db
+    remove_db_file(shadow)
+
+def table_schemas(db:sqlite3.Connection) -> Dict[str, str]:
+    return dict(db.execute("SELECT name, sql FROM sqlite_master WHERE type='table'").fetchall())
+
+def table_counts(db:sqlite3.Connection, tables:List[str]) -> Dict[str, int]:
+    return {table: db.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0] for table in tables}
+
+def check_shadow_db(shadow:str, db_path:str) -> List[str]:
+    """
+    Check the shadow db before it is copied into the live db: integrity, all tables present,
+    no table with fewer rows than in the live db (imports only upsert, unless the table was rebuilt with a new schema,
+    see db_setup.create_db), fact tables not empty, and aggregate tables' counts matching their fact tables.
+    -----------
+    returns:
+        list of failed checks (empty if all pass)
+    """
+    failures = []
+    db = sqlite3.connect(db_uri(shadow, 'mode=ro'), uri=True)
+    try:
+        integrity = [row[0] for row in db.execute("PRAGMA integrity_check")]
+        if integrity != ['ok']:
+            failures.append(f'Integrity check: {integrity[:5]}')
+
+        schemas = table_schemas(db)
+        counts = table_counts(db, list(schemas))
+        for table in [t.__name__ for t in ALL_DB_TABLES] + list(AGGREGATE_TABLES):
+            if table not in counts:
+                failures.append(f'Missing table {table}')
+        for table in NATURAL_KEYS:
+            if counts.get(table) == 0:
+                failures.append(f'Empty fact table {table}')
+
+        if os.path.exists(db_path):
+            live = sqlite3.connect(db_uri(db_path, 'mode=ro'), uri=True)
+            try:
+                same_schema = [table for table, schema in table_schemas(live).items()
+                               if table in schemas and schemas[table] == schema]
+                for table, live_count in table_counts(live, same_schema).items():
+                    if counts[table] < live_count:
+                        failures.append(f'{table}: {counts[table]} rows, {live_count} in the live db')
+            finally:
+                live.close()
+
+        for agg_table, aggregate in AGGREGATE_TABLES.items():
+            if agg_table in counts and aggregate.table in counts:
+                aggregated = db.execute(f"SELECT COALESCE(SUM(count), 0) FROM {agg_table}").fetchone()[0]
+                grouped = ' AND '.join(f'{expression} IS NOT NULL' for _, expression in aggregate.groups.values())
+                rows = db.execute(f"SELECT COUNT({aggregate.value}) FROM {aggregate.table} WHERE {grouped}").fetchone()[0]
+                if aggregated != rows:
+                    failures.append(f'{agg_table}: {aggregated} rows aggregated, {rows} in {aggregate.table}')
+    finally:
+        db.close()
+
+    return failures
+
+def copy_shadow_db(shadow:str, db_path:str) -> None:
+    """
+    Copy the (checked) shadow db into the live db with the sqlite backup API, then remove it.
+    The copy is a single write transaction on the live db, through its WAL: readers keep reading the previous data
+    until it commits, then the new data, without reopening. The live db file is never replaced, as renaming
+    a file over a WAL db would pair it with the WAL (and shared memory) of the previous one, still used by its readers.
+    """
+    close_connections() # This thread's connections, e.g. to the shadow db
+
+    shadow_db = sqlite3.connect(shadow)
+    live = sqlite3.connect(db_path, timeout=BUSY_TIMEOUT_S)
+    try:
+        live.execute("PRAGMA journal_mode=WAL")
+        shadow_db.backup(live)
+        busy, _, _ = live.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchone()
+        if busy:
+            logging.info(f'{db_path} WAL left to checkpoint, as still read from.') # By the next writer / checkpoint
+    finally:
+        live.close()
+        shadow_db.close()
+
+    remove_db_file(shadow)
+    logging.info(f'Copied the imported db into {db_path}.')
@@ -0,0 +1,83 @@
+"""
+This file contains the read-only snapshots of the db, published at the end of the ingest (emissions.py --publish-snapshot),
+for the API's serving mode (see api_db.ReadPool, ECOACT_SERVE_SNAPSHOTS):
+    <snapshot dir>/ecoact-<timestamp>.db    (compacted copy of the db, never written to once published)
+    <snapshot dir>/CURRENT                  (name of the latest snapshot)
+As a snapshot never changes, readers open it with immutable=1 (no locks, no WAL / shm files, no change checks),
+and memory-map it: the pages are then shared by all processes reading it (e.g. uvicorn workers) through the OS page cache.
+Publishing a new snapshot only replaces CURRENT (atomically), which readers switch to between requests.
+"""
+import os
+import logging
+import sqlite3
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Optional
+
+from src.db.db_connection import get_connection
+
+logging.basicConfig(level=logging.INFO)
+
+SNAPSHOT_DIR = Path(os.environ.get('ECOACT_SNAPSHOT_DIR', './snapshots'))
+KEEP_SNAPSHOTS = 3 # Older ones are removed once a new one is published (open files stay readable until closed)
+
+def publish_snapshot(snapshot_dir:Path=SNAPSHOT_DIR) -> Path:
+    """
+    Copy the db (default: get_db_path()) to a new snapshot file, and point CURRENT to it.
+    -----------
+    returns:
+        path of the snapshot
+    """
+    snapshot_dir = Path(snapshot_dir)
+    snapshot_dir.mkdir(parents=True, exist_ok=True)
+    path = snapshot_dir / f"ecoact-{datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S%f')}.db"
+    tmp_path = path.with_suffix('.db.tmp')
+
+    # VACUUM INTO: a consistent, compacted copy (read in a single transaction, so of committed data only)
+    db = get_connection()
+    db.execute("VACUUM INTO ?", (str(tmp_path),))
+
+    # Rollback journal mode, as immutable readers don't use the WAL (and the file is never written again)
+    snapshot = sqlite3.connect(tmp_path)
+    snapshot.execute("PRAGMA journal_mode=DELETE")
+    snapshot.close()
+    with open(tmp_path, 'rb') as f:
+        os.fsync(f.fileno())
+
+    os.replace(tmp_path, path)
+    write_current(snapshot_dir, path.name)
+    logging.info(f'Published snapshot {path}.')
+
+    remove_old_snapshots(snapshot_dir)
+    return path
+
+def write_current(snapshot_dir:Path, snapshot:str) -> None:
+    # Replaced atomically, so readers never see a partial pointer
+    tmp_path = Path(snapshot_dir) / 'CURRENT.tmp'
+    tmp_path.write_text(snapshot)
+    os.replace(tmp_path, Path(snapshot_dir) / 'CURRENT')
+
+def current_snapshot(snapshot_dir:Path=SNAPSHOT_DIR) -> Optional[Path]:
+    try:
+        snapshot = (Path(snapshot_dir) / 'CURRENT').read_text().strip()
+    except FileNotFoundError:
+        return None
+    return Path(snapshot_dir) / snapshot if snapshot else None
+
+def remove_old_snapshots(snapshot_dir:Path, keep:int=KEEP_SNAPSHOTS) -> None:
+    current = current_snapshot(snapshot_dir)
+    snapshots = sorted(Path(snapshot_dir).glob('ecoact-*.db'), reverse=True) # Timestamped names, newest first
+    for snapshot in snapshots[keep:]:
+        if snapshot != current:
+            snapshot.unlink(missing_ok=True)
+
+def warm_page_cache(path:Path, block_size:int=1 << 20) -> None:
+    """
+    Read the whole file once, so its pages are in the OS page cache (shared by all processes) before serving.
+    """
+    block = bytearray(block_size)
+    with open(path, 'rb', buffering=0) as f:
+        if hasattr(os, 'posix_fadvise'):
+            os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+        while f.readinto(block):
+            pass
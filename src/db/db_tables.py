@@ -1,8 +1,12 @@
 """
 This file contains the queries to create each db tables.
 Also contains a list, ALL_DB_TABLES, of callable functions,
-to execute each table on db setup (see db_setup.py).
+to execute each table on db setup (see db_setup.py),
+the natural (unique) key of each fact table, NATURAL_KEYS,
+the covering indexes of each API lookup, COVERING_INDEXES,
+and the materialized aggregates of each fact table, AGGREGATE_TABLES.
 """
+from typing import Dict, List, NamedTuple, Tuple
 
 def Dim_Countries() -> str:
     return """CREATE TABLE Dim_Countries (
@@ -69,10 +73,12 @@ def Dim_Forest_types() -> str:
 """
 
 def FR_regional_heating_emissions() -> str:
-    # TODO: Add unique feature to differentiate whether data is already in db.
+    # element_id is the source 'Identifiant de l'élément', as a dept has several heating networks
+    # row_hash is a content hash of the row, to skip unchanged rows on re-import
     return """ CREATE TABLE FR_regional_heating_emissions (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 dept_id TEXT NOT NULL,
+                element_id INTEGER NOT NULL,
                 heat_cycle TEXT NOT NULL,
                 emissions REAL NOT NULL,
                 unit_id INT NOT NULL,
@@ -81,6 +87,7 @@ def FR_regional_heating_emissions() -> str:
                 modified_date DATE,
                 validity_date DATE NOT NULL,
                 source_id INTEGER,
+                row_hash INTEGER NOT NULL,
                 FOREIGN KEY (dept_id) REFERENCES Dim_Departments (dept_id),
                 FOREIGN KEY (unit_id) REFERENCES Dim_Units (unit_id),
                 FOREIGN KEY (source_id) REFERENCES Dim_Sources (source_id)
@@ -88,6 +95,7 @@ def FR_regional_heating_emissions() -> str:
         """
 
 def World_electricity_emissions() -> str:
+    # row_hash is a content hash of the row, to skip unchanged rows on re-import
     return """ CREATE TABLE World_electricity_emissions (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             country_iso_3 TEXT NOT NULL,
@@ -99,6 +107,7 @@ def World_electricity_emissions() -> str:
             creation_date DATE NOT NULL,
             modified_date DATE,
             source_id INTEGER,
+            row_hash INTEGER NOT NULL,
             FOREIGN KEY (country_iso_3) REFERENCES Dim_Countries (iso_3),
             FOREIGN KEY (post_type_id) REFERENCES Dim_Elec_mix_post_types (post_type_id),
             FOREIGN KEY (unit_id) REFERENCES Dim_Units (unit_id),
@@ -108,9 +117,12 @@ def World_electricity_emissions() -> str:
 
 
 def FR_forestry_area() -> str:
+    # element_id is the source 'Identifiant de l'élément', as merged regions hold several former regions
+    # row_hash is a content hash of the row, to skip unchanged rows on re-import
     return """ CREATE TABLE FR_forestry_area (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             region_id INTEGER NOT NULL,
+            element_id INTEGER NOT NULL,
             forest_type_id INTEGER NOT NULL,
             tree_type_id INTEGER NOT NULL,
             land_loss REAL NOT NULL,
@@ -120,6 +132,7 @@ def FR_forestry_area() -> str:
             creation_date DATE NOT NULL,
             modified_date DATE,
             source_id INTEGER,
+            row_hash INTEGER NOT NULL,
             FOREIGN KEY (region_id) REFERENCES Dim_Regions (region_id),
             FOREIGN KEY (unit_id) REFERENCES Dim_Units (unit_id),
             FOREIGN KEY (tree_type_id) REFERENCES Dim_Tree_types (tree_type_id),
@@ -159,3 +172,69 @@ ALL_DB_TABLES = [
     World_electricity_emissions,
     FR_forestry_area
 ]
+
+# Natural key of each fact table, i.e. the columns identifying a row across imports (see upsert_data)
+NATURAL_KEYS = {
+    'FR_regional_heating_emissions': ['dept_id', 'element_id', 'heat_cycle', 'validity_date'],
+    'World_electricity_emissions': ['country_iso_3', 'post_type_id', 'validity_date', 'source_id'],
+    'FR_forestry_area': ['element_id', 'region_id', 'forest_type_id', 'tree_type_id', 'validity_date'],
+}
+
+# Covering indexes, i.e. holding every column read by the API queries (see src/api/api_queries.py),
+# or by the aggregate refreshes (see db_aggregates.py), so lookups never read the table itself.
+# API queries checked with: python -m src.api.api_queries
+COVERING_INDEXES = {
+    'World_electricity_emissions_by_country_post_type': ('World_electricity_emissions', ['country_iso_3', 'post_type_id', 'validity_date', 'emissions']),
+    'FR_regional_heating_emissions_by_dept': ('FR_regional_heating_emissions', ['dept_id', 'validity_date', 'emissions']),
+    'FR_forestry_area_by_region': ('FR_forestry_area', ['region_id', 'forest_type_id', 'tree_type_id', 'land_loss']),
+}
+
+# Indexes replaced by the ones above, dropped from existing dbs
+SUPERSEDED_INDEXES = ['World_electricity_emissions_by_country']
+
+def natural_key_indexes() -> List[str]:
+    return [f"""CREATE UNIQUE INDEX IF NOT EXISTS {table}_natural_key 
+                ON {table} ({', '.join(key)});
+            """ for table, key in NATURAL_KEYS.items()]
+
+def covering_indexes() -> List[str]:
+    return [f"""CREATE INDEX IF NOT EXISTS {index} 
+                ON {table} ({', '.join(columns)});
+            """ for index, (table, columns) in COVERING_INDEXES.items()]
+
+def superseded_indexes() -> List[str]:
+    return [f"DROP INDEX IF EXISTS {index};" for index in SUPERSEDED_INDEXES]
+
+def all_db_indexes() -> List[str]:
+    return superseded_indexes() + natural_key_indexes() + covering_indexes()
+
+# Materialized aggregates of the fact tables: count/sum/min/max/mean of a value column per group,
+# refreshed at ingest for the groups touched only (see db_aggregates.py).
+# Groups are derived from natural key columns, so an updated row never moves from one group to another.
+YEAR = "CAST(strftime('%Y', validity_date) AS INTEGER)"
+
+class AggregateTable(NamedTuple):
+    table: str                          # Fact table
+    groups: Dict[str, Tuple[str, str]]  # Group column: (type, expression on the fact table)
+    value: str                          # Aggregated fact column
+
+AGGREGATE_TABLES = {
+    'Agg_FR_regional_heating_emissions': AggregateTable('FR_regional_heating_emissions',
+        {'dept_id': ('TEXT', 'dept_id'), 'heat_cycle': ('TEXT', 'heat_cycle'), 'year': ('INTEGER', YEAR)}, 'emissions'),
+    'Agg_World_electricity_emissions': AggregateTable('World_electricity_emissions',
+        {'country_iso_3': ('TEXT', 'country_iso_3'), 'post_type_id': ('INTEGER', 'post_type_id'), 'year': ('INTEGER', YEAR)}, 'emissions'),
+    'Agg_FR_forestry_area': AggregateTable('FR_forestry_area',
+        {'region_id': ('INTEGER', 'region_id'), 'forest_type_id': ('INTEGER', 'forest_type_id'), 'tree_type_id': ('INTEGER', 'tree_type_id')}, 'land_loss'),
+}
+
+def aggregate_tables() -> List[str]:
+    return [f"""CREATE TABLE IF NOT EXISTS {agg_table} (
+                {', '.join(f'{column} {type_} NOT NULL' for column, (type_, _) in groups.items())},
+                count INTEGER NOT NULL,
+                sum REAL,
+                min REAL,
+                max REAL,
+                mean REAL,
+                PRIMARY KEY ({', '.join(groups)})
+            ) WITHOUT ROWID;
+            """ for agg_table, (_, groups, _) in AGGREGATE_TABLES.items()]
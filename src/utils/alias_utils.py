@@ -0,0 +1,91 @@
+"""
+This file contains the normalization of country & region names to the names of the db dimensions
+(data/countries.csv, data/french_regions.csv), driven by alias tables (data/country_aliases.csv, data/region_aliases.csv):
+e.g. 'Bélarus' -> 'Biélorussie', 'Rhône-Alpes' -> 'Auvergne-Rhône-Alpes'.
+Names are matched exactly, once accents, case, punctuation & spacing are normalized (see name_key),
+and only each distinct value is looked up, the results being mapped back onto every row: O(unique names).
+Aliases with an empty name are not countries / regions (e.g. 'Union européenne à 27'), and normalized to NA.
+Names left unresolved are kept as is (so reported by the db dimensions), and logged with the closest known name.
+"""
+import re
+import difflib
+import logging
+import unicodedata
+from functools import lru_cache
+from typing import Dict, Optional, Tuple
+
+import pandas as pd
+
+logging.basicConfig(level=logging.INFO)
+
+COUNTRY_NAMES = ('./data/countries.csv', 'fr_country_name')
+COUNTRY_ALIASES = './data/country_aliases.csv'
+REGION_NAMES = ('./data/french_regions.csv', 'region_name')
+REGION_ALIASES = './data/region_aliases.csv'
+ENCODING = 'latin-1'
+
+class NameNormalizer:
+    """
+    Resolves names to their canonical name, through the canonical names themselves and their aliases.
+    """
+
+    def __init__(self, kind:str, names:pd.Series, aliases:Dict[str, str]) -> None:
+        self.kind = kind # e.g. 'country', for logging
+        self.lookup: Dict[str, Optional[str]] = {name_key(name): name for name in names}
+        self.lookup.update({name_key(alias): name or None for alias, name in aliases.items()})
+        self.keys = tuple(key for key, name in self.lookup.items() if name is not None)
+
+    def normalize(self, data:pd.Series) -> pd.Series:
+        """
+        Canonical name of each value (NA for aliases of non countries / regions, unchanged if unresolved).
+        """
+        names = {}
+        unresolved = {}
+        for value in data.dropna().unique():
+            key = name_key(value)
+            if key in self.lookup:
+                names[value] = self.lookup[key]
+            else:
+                names[value] = value
+                unresolved[value] = self.suggest(key)
+
+        if unresolved:
+            logging.warning(f'Unresolved {self.kind} names (closest known name): {unresolved}')
+
+        return data.map(names)
+
+    def suggest(self, key:str) -> Optional[str]:
+        match = closest_key(key, self.keys)
+        return self.lookup[match] if match else None
+
+@lru_cache(maxsize=None)
+def name_key(name:str) -> str:
+    """
+    Matching key of a name: without accents, case, apostrophes, nor other punctuation & repeated spaces,
+    e.g. "Côte d'Ivoire" & 'Cote dIvoire' -> 'cote divoire', 'Rhône-Alpes ' -> 'rhone alpes'.
+    """
+    key = unicodedata.normalize('NFKD', name).encode('ascii', 'ignore').decode().casefold()
+    key = key.replace("'", '')
+    return re.sub(r'[\W_]+', ' ', key).strip()
+
+@lru_cache(maxsize=4096)
+def closest_key(key:str, keys:Tuple[str, ...]) -> Optional[str]:
+    # Fuzzy match, cached per unresolved name, as the same names are met on every import (and chunk)
+    matches = difflib.get_close_matches(key, keys, n=1, cutoff=0.75)
+    return matches[0] if matches else None
+
+def load_aliases(path:str, name_column:str) -> Dict[str, str]:
+    aliases = pd.read_csv(path, encoding=ENCODING, keep_default_na=False)
+    return dict(zip(aliases['alias'], aliases[name_column]))
+
+@lru_cache(maxsize=None)
+def country_normalizer() -> NameNormalizer:
+    path, column = COUNTRY_NAMES
+    names = pd.read_csv(path, encoding=ENCODING, keep_default_na=False)[column]
+    return NameNormalizer('country', names, load_aliases(COUNTRY_ALIASES, column))
+
+@lru_cache(maxsize=None)
+def region_normalizer() -> NameNormalizer:
+    path, column = REGION_NAMES
+    names = pd.read_csv(path, encoding=ENCODING)[column]
+    return NameNormalizer('region', names, load_aliases(REGION_ALIASES, column))
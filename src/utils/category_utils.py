@@ -0,0 +1,67 @@
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Tuple
+
+CATEGORY_COLUMN = "Code de la catégorie"
+CATEGORY_SEP = " > "
+CATEGORY_LEVELS = ['Cat1', 'Cat2', 'Cat3', 'Cat4', 'Cat5', 'Cat6']
+
+class CategoryPartitioner:
+    """
+    Parses the category path of the full dataset once (e.g. 'Electricité > Mix réseau électrique > ...')
+    into categorical Cat1..Cat6 columns, and sorts rows so that every category prefix
+    is a contiguous block of rows. Each dataset can then retrieve its own slice
+    from the prefix index, without re-splitting or re-filtering the full dataset.
+    """
+
+    def __init__(self, data:pd.DataFrame, column:str=CATEGORY_COLUMN, sep:str=CATEGORY_SEP) -> None:
+        self.sep = sep
+
+        # Split each distinct path only once
+        codes, paths = pd.factorize(data[column], use_na_sentinel=True)
+        levels = [path.split(sep) for path in paths]
+
+        # Sorting paths level by level makes every prefix a contiguous range of (sorted) paths
+        order = sorted(range(len(paths)), key=lambda i: levels[i])
+        rank = np.empty(len(paths) + 1, dtype=np.int64)
+        rank[order] = np.arange(len(paths))
+        rank[-1] = len(paths) # Rows without category go last
+        row_rank = rank[codes]
+        row_order = np.argsort(row_rank, kind='stable')
+
+        self.data = data.iloc[row_order].copy() # Only copy of the dataset, partitions are slices of it
+        sorted_codes = codes[row_order]
+        for i, level in enumerate(CATEGORY_LEVELS):
+            level_values = pd.Categorical([l[i] if i < len(l) else None for l in levels])
+            self.data[level] = level_values.take(sorted_codes, allow_fill=True)
+
+        # Prefix index, e.g. 'Electricité > Mix réseau électrique' -> (first_row, last_row + 1)
+        counts = np.bincount(row_rank, minlength=len(paths) + 1)
+        offsets = np.concatenate(([0], np.cumsum(counts)))
+        self.index: Dict[str, Tuple[int, int]] = {}
+        for position, path_id in enumerate(order):
+            start, stop = offsets[position], offsets[position + 1]
+            for depth in range(1, len(levels[path_id]) + 1):
+                prefix = sep.join(levels[path_id][:depth])
+                first, _ = self.index.get(prefix, (start, stop))
+                self.index[prefix] = (int(first), int(stop))
+
+    def prefixes(self, depth:int) -> List[str]:
+        return [prefix for prefix in self.index if prefix.count(self.sep) == depth - 1]
+
+    def partition(self, category:str) -> pd.DataFrame:
+        """
+        Given a category prefix, e.g. 'Electricité > Mix réseau électrique > Autres pays du monde',
+        return all rows under that category, as a slice of the sorted dataset.
+        A level may be given as '*' to match any value, e.g. '* > Forêts françaises'.
+        """
+        levels = category.split(self.sep)
+        if '*' not in levels:
+            start, stop = self.index.get(category, (0, 0))
+            return self.data.iloc[start:stop]
+
+        ranges = [self.index[prefix] for prefix in self.prefixes(len(levels))
+                  if all(l in ('*', p) for l, p in zip(levels, prefix.split(self.sep)))]
+        if not ranges:
+            return self.data.iloc[0:0]
+        return pd.concat([self.data.iloc[start:stop] for start, stop in ranges])
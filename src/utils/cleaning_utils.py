@@ -1,40 +1,50 @@
 import pandas as pd
-import locale
+import re
+import unicodedata
 from datetime import datetime
+from functools import lru_cache
+
+from src.utils.alias_utils import country_normalizer, region_normalizer
+
+FR_MONTHS = {'janvier': 1, 'fevrier': 2, 'mars': 3, 'avril': 4, 'mai': 5, 'juin': 6, 'juillet': 7,
+             'aout': 8, 'septembre': 9, 'octobre': 10, 'novembre': 11, 'decembre': 12}
 
 def clean_FR_dates(data:pd.Series, input_format:str) -> pd.Series:
-    # set the locale to French
-    locale.setlocale(locale.LC_TIME, 'fr_FR.UTF-8')
+    """
+    Convert french dates (e.g. 'Février 2020', 'Aout 2019') to datetimes.
+    Only parses each distinct value once, then maps the results back onto every row.
+    """
+    parsed_dates = {value: parse_FR_date(value, input_format) for value in data.dropna().unique()}
     
-    # Ensure months have accents
-    data = data.replace({'Fevrier':'Février', 'Aout':'Août','Decembre':'Décembre'}, regex=True)
+    return pd.to_datetime(data.map(parsed_dates))
+
+@lru_cache(maxsize=4096)
+def parse_FR_date(value:str, input_format:str) -> datetime:
+    """
+    Locale-free equivalent of datetime.strptime(value, input_format) under a french locale:
+    month names (with or without accents) are swapped for their number, and %B for %m.
+    As no process-wide locale is set, this is safe to call from multiple threads.
+    """
+    if '%B' in input_format:
+        value = re.sub(r'[^\W\d_]+', _FR_month_number, value)
+        input_format = input_format.replace('%B', '%m')
     
-    # Convert to FR datetime
-    data = data.apply(lambda x: datetime.strptime(x, input_format))
+    return datetime.strptime(value, input_format)
 
-    return pd.to_datetime(data)
+def _FR_month_number(match:re.Match) -> str:
+    word = unicodedata.normalize('NFKD', match.group()).encode('ascii', 'ignore').decode().lower()
+    return f'{FR_MONTHS[word]:02d}' if word in FR_MONTHS else match.group()
 
 def update_FR_region_names(data:pd.Series) -> pd.Series:
-    region_name_map = {
-        "Alsace" : "Grand Est",
-        "Champagne-Ardenne" : "Grand Est",
-        "Lorraine": "Grand Est",
-        "Aquitaine": "Aquitaine-Limousin-Poitou-Charentes",
-        "Limousin": "Aquitaine-Limousin-Poitou-Charentes",
-        "Poitou-Charentes": "Aquitaine-Limousin-Poitou-Charentes",
-        "Auvergne": "Auvergne-Rhône-Alpes",
-        "Rhône-Alpes": "Auvergne-Rhône-Alpes",
-        "Bourgogne" : "Bourgogne-Franche-Comté Dijon",
-        "Franche-Comté": "Bourgogne-Franche-Comté Dijon",
-        "Centre-Val de Loire": "Centre",
-        "Languedoc-Roussillon": "Occitanie",
-        "Midi-Pyrénées":"Occitanie",
-        "Midi-Pyrenées":"Occitanie",
-        "Nord-Pas-de-Calais": "Hauts de France",
-        "Picardie":"Hauts de France",
-        "Basse-Normandie": "Normandie",
-        "Haute-Normandie": "Normandie",
-    }
-    data.replace(region_name_map, regex=True, inplace=True)
-    
-    return data.str.strip()
\ No newline at end of file
+    """
+    Rename former french regions (e.g. 'Alsace') to the current ones (e.g. 'Grand Est'), see alias_utils.
+    Names that aren't regions (e.g. 'France') become NA.
+    """
+    return region_normalizer().normalize(data)
+
+def update_country_names(data:pd.Series) -> pd.Series:
+    """
+    Rename countries to their db name (e.g. 'Bélarus' to 'Biélorussie'), see alias_utils.
+    Names that aren't countries (e.g. 'Union européenne à 27') become NA.
+    """
+    return country_normalizer().normalize(data)
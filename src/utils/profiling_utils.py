@@ -0,0 +1,145 @@
+"""
+This file contains the ingest's instrumentation: PipelineProfiler runs each stage of a dataset's pipeline
+(retrieve -> clean -> prep -> upsert, see emissions.py), and records per stage:
+wall & CPU time, rows in & out (i.e. rows dropped, apart from rows unchanged since the last import on upsert),
+foreign key values left unresolved by the db dimensions,
+peak RSS of the stage (sampled while it runs, and its growth over the stage's starting RSS),
+and (if trace_memory) the peak of python allocations (tracemalloc).
+Records are appended as JSON lines to METRICS_FILE, for regression tracking of the ingest over time.
+"""
+import os
+import json
+import time
+import logging
+import threading
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+import pandas as pd
+
+from src.db.db_dims import Dimension
+
+logging.basicConfig(level=logging.INFO)
+
+METRICS_FILE = Path(os.environ.get('ECOACT_METRICS_FILE', './.cache/ingest_metrics.jsonl'))
+
+RSS_SAMPLE_INTERVAL_S = 0.005
+
+class PipelineProfiler:
+    """
+    Records the metrics of each pipeline stage run through it (see run).
+    Picklable, so stages run in worker processes can be recorded there, and their records merged back.
+    """
+
+    def __init__(self, run_id:str=None, trace_memory:bool=False) -> None:
+        self.run_id = run_id or datetime.now(timezone.utc).isoformat(timespec='seconds')
+        self.trace_memory = trace_memory
+        self.records: List[Dict[str, Any]] = []
+
+    def run(self, dataset:str, stage:str, func:Callable[..., Any], data:Any, *args,
+            db_dims:Dict[str, Dimension]=None) -> Any:
+        """
+        Run func(data, *args) as the given dataset's stage, recording its metrics, and return its result.
+        Unresolved foreign keys are counted from the db_dims used by the stage, if given.
+        """
+        unresolved_before = unresolved_counts(db_dims)
+        if self.trace_memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        with RssSampler() as rss:
+            result = func(data, *args)
+        wall_time, cpu_time = time.perf_counter() - wall_start, time.process_time() - cpu_start
+
+        record = {
+            'run_id': self.run_id,
+            'dataset': dataset,
+            'stage': stage,
+            'wall_s': round(wall_time, 6),
+            'cpu_s': round(cpu_time, 6),
+            'rows_in': count_rows(data),
+            'rows_out': count_rows(result),
+            'peak_rss_mb': mb(rss.peak),
+            'rss_growth_mb': mb(rss.peak - rss.start) if rss.peak is not None else None,
+        }
+        # Rows left out as unchanged since the last import (see upsert_data) are not dropped
+        unchanged = result.attrs.get('rows_unchanged') if isinstance(result, pd.DataFrame) else None
+        if unchanged is not None:
+            record['rows_unchanged'] = unchanged
+        if record['rows_in'] is not None and record['rows_out'] is not None:
+            record['rows_dropped'] = record['rows_in'] - record['rows_out'] - (unchanged or 0)
+        if self.trace_memory:
+            record['peak_traced_mb'] = round(tracemalloc.get_traced_memory()[1] / 1e6, 1)
+        if db_dims is not None:
+            unresolved = {dim: count - unresolved_before.get(dim, 0)
+                          for dim, count in unresolved_counts(db_dims).items()}
+            record['unresolved_fks'] = {dim: count for dim, count in unresolved.items() if count}
+
+        self.records.append(record)
+        return result
+
+    def merge(self, records:List[Dict[str, Any]]) -> None:
+        self.records.extend(records)
+
+    def write(self, path:Path=METRICS_FILE) -> None:
+        """
+        Append this run's records as JSON lines.
+        """
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'a', encoding='utf-8') as f:
+            for record in self.records:
+                f.write(json.dumps(record, ensure_ascii=False) + '\n')
+        logging.info(f'Wrote {len(self.records)} ingest stage metrics to {path}.')
+
+    def summary(self) -> pd.DataFrame:
+        return pd.DataFrame(self.records).drop(columns='run_id')
+
+class RssSampler:
+    """
+    Samples the resident memory of the process on a background thread, within a with block (e.g. a stage),
+    for the block's own peak: ru_maxrss is the peak of the whole process so far, i.e. of the largest previous stage.
+    Only on linux (/proc), peak being None elsewhere.
+    """
+
+    def __enter__(self) -> 'RssSampler':
+        self.start = current_rss()
+        self.peak = self.start
+        self._stop = threading.Event()
+        if self.start is not None:
+            self._thread = threading.Thread(target=self._sample, daemon=True)
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        if self.start is not None:
+            self._stop.set()
+            self._thread.join()
+            self.peak = max(self.peak, current_rss())
+
+    def _sample(self) -> None:
+        while not self._stop.wait(RSS_SAMPLE_INTERVAL_S):
+            self.peak = max(self.peak, current_rss())
+
+def current_rss() -> int:
+    # Resident memory of the process (bytes), from the second field of /proc/self/statm (in pages)
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return None
+
+def mb(size:int) -> float:
+    return round(size / 1e6, 1) if size is not None else None
+
+def count_rows(data:Any) -> int:
+    return len(data) if isinstance(data, (pd.DataFrame, pd.Series)) else None
+
+def unresolved_counts(db_dims:Dict[str, Dimension]=None) -> Dict[str, int]:
+    if db_dims is None:
+        return {}
+    return {name: sum(dim.unresolved.values()) for name, dim in db_dims.items()}
@@ -0,0 +1,177 @@
+"""
+This file contains the reader of the Base Carbone source export (donnees_candidats_dev_python.csv).
+The file is read once, in chunks of CHUNK_SIZE rows, with an explicit schema (SOURCE_SCHEMA):
+only the columns used by the datasets are parsed, and repeated text columns are read as categoricals.
+Each chunk is partitioned on the dataset categories (see CategoryPartitioner), and only these rows are kept,
+alongside the unique units & sources (for the db dimensions), so peak memory is bounded by one chunk
+plus the datasets' rows, whatever the size of the export.
+Parsed sources are cached (see load_source), keyed on the file's content hash, the schema & PARSER_VERSION,
+as Arrow IPC files memory-mapped back on later runs, so an unchanged export is never parsed twice.
+"""
+import os
+import json
+import shutil
+import hashlib
+import logging
+import pandas as pd
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional
+
+from src.utils.category_utils import CATEGORY_COLUMN, CategoryPartitioner
+
+logging.basicConfig(level=logging.INFO)
+
+SOURCE_FILE = Path('./data/donnees_candidats_dev_python.csv')
+SOURCE_ENCODING = 'latin-1'
+CHUNK_SIZE = 100_000
+
+# Columns used by the datasets (see src/dataset_func), and their dtypes
+SOURCE_SCHEMA = {
+    'Type Ligne': 'category',
+    "Identifiant de l'élément": 'Int64',
+    "Statut de l'élément": 'category',
+    CATEGORY_COLUMN: 'object',
+    'Localisation géographique': 'object',
+    'Sous-localisation géographique français': 'object',
+    'Période de validité': 'object',
+    'Type poste': 'object', # Not categorical, as filled with new values (e.g. 'Total')
+    'Unité français': 'category',
+    'Total poste non décomposé': 'float64',
+    'Source': 'category',
+    'Incertitude': 'object',
+    'Date de création': 'object',
+    'Date de modification': 'object',
+    'Nom attribut français': 'object',
+    'Nom base français': 'object',
+    'Nom frontière français': 'object',
+}
+CATEGORICAL_COLUMNS = [col for col, dtype in SOURCE_SCHEMA.items() if dtype == 'category']
+
+# Parsed source cache. Bump PARSER_VERSION on any change to how the source is read or partitioned,
+# so previously cached sources are parsed again.
+PARSER_VERSION = 1
+CACHE_DIR = Path(os.environ.get('ECOACT_CACHE_DIR', './.cache/source'))
+MAX_CACHE_ENTRIES = 4
+
+class SourceData(NamedTuple):
+    partitions: Dict[str, pd.DataFrame] # Category: rows of that category
+    units: List[str]                    # Unique 'Unité français' values, in order of appearance
+    sources: List[str]                  # Unique 'Source' values, in order of appearance
+
+def read_source(categories:List[str], path:Path=SOURCE_FILE, chunksize:int=CHUNK_SIZE) -> SourceData:
+    """
+    Read the source export once, in chunks, keeping only the rows of the given categories
+    (e.g. 'Réseaux de chaleur / froid', see CategoryPartitioner.partition), and the unique units & sources.
+    """
+    parts: Dict[str, List[pd.DataFrame]] = {category: [] for category in categories}
+    units: Dict[str, None] = {}
+    sources: Dict[str, None] = {}
+    rows = 0
+
+    chunks = pd.read_csv(path, encoding=SOURCE_ENCODING, usecols=list(SOURCE_SCHEMA), dtype=SOURCE_SCHEMA,
+                         chunksize=chunksize)
+    for chunk in chunks:
+        rows += len(chunk)
+        units.update(dict.fromkeys(chunk['Unité français'].dropna().unique()))
+        sources.update(dict.fromkeys(chunk['Source'].dropna().unique()))
+
+        partitioner = CategoryPartitioner(chunk)
+        for category in categories:
+            partition = partitioner.partition(category)
+            if not partition.empty or not parts[category]:
+                parts[category].append(partition)
+
+    logging.info(f'Read {rows} rows from {path}.')
+    partitions = {category: concat_partitions(category_parts) for category, category_parts in parts.items()}
+
+    return SourceData(partitions, list(units), list(sources))
+
+def concat_partitions(parts:List[pd.DataFrame]) -> pd.DataFrame:
+    """
+    Concatenate a category's rows from all chunks.
+    Each chunk has its own categories, so categorical columns are unified again once concatenated.
+    """
+    if len(parts) == 1:
+        return parts[0]
+
+    data = pd.concat(parts)
+    for col in CATEGORICAL_COLUMNS:
+        data[col] = data[col].astype('category')
+    return data
+
+def load_source(categories:List[str], path:Path=SOURCE_FILE, chunksize:int=CHUNK_SIZE,
+                cache_dir:Optional[Path]=CACHE_DIR) -> SourceData:
+    """
+    As read_source, but from the parsed source cache if the file, schema, parser & categories are unchanged.
+    Caching is skipped if cache_dir is None, or pyarrow isn't installed.
+    """
+    try:
+        import pyarrow
+        import pyarrow.ipc
+    except ImportError:
+        pyarrow = None
+    if cache_dir is None or pyarrow is None:
+        return read_source(categories, path, chunksize)
+
+    entry_dir = Path(cache_dir) / cache_key(path, categories)
+    if (entry_dir / 'meta.json').exists():
+        source = read_cache_entry(pyarrow, entry_dir, categories)
+        os.utime(entry_dir) # Most recently used, see MAX_CACHE_ENTRIES
+        logging.info(f'Loaded parsed {path} from cache ({entry_dir.name}).')
+        return source
+
+    source = read_source(categories, path, chunksize)
+    write_cache_entry(pyarrow, entry_dir, source)
+    return source
+
+def cache_key(path:Path, categories:List[str]) -> str:
+    key = hashlib.blake2b(digest_size=16)
+    key.update(file_hash(path).encode())
+    key.update(json.dumps([PARSER_VERSION, SOURCE_ENCODING, SOURCE_SCHEMA, sorted(categories)]).encode())
+    return key.hexdigest()
+
+def file_hash(path:Path, block_size:int=1 << 20) -> str:
+    file_digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            file_digest.update(block)
+    return file_digest.hexdigest()
+
+def read_cache_entry(pa, entry_dir:Path, categories:List[str]) -> SourceData:
+    with open(entry_dir / 'meta.json') as f:
+        meta = json.load(f)
+
+    partitions = {}
+    for category in categories:
+        with pa.memory_map(str(entry_dir / meta['files'][category]), 'r') as source:
+            partitions[category] = pa.ipc.open_file(source).read_all().to_pandas()
+
+    return SourceData(partitions, meta['units'], meta['sources'])
+
+def write_cache_entry(pa, entry_dir:Path, source:SourceData) -> None:
+    """
+    Write the parsed source to a temporary dir, renamed once complete, so a cache entry is never partial.
+    Older entries are removed beyond MAX_CACHE_ENTRIES.
+    """
+    tmp_dir = entry_dir.with_name(f'{entry_dir.name}.tmp{os.getpid()}')
+    tmp_dir.mkdir(parents=True, exist_ok=True)
+
+    files = {}
+    for i, (category, data) in enumerate(source.partitions.items()):
+        files[category] = f'{i}.arrow'
+        table = pa.Table.from_pandas(data)
+        with pa.ipc.new_file(str(tmp_dir / files[category]), table.schema) as writer:
+            writer.write_table(table)
+    with open(tmp_dir / 'meta.json', 'w') as f:
+        json.dump({'files': files, 'units': source.units, 'sources': source.sources}, f, ensure_ascii=False)
+
+    try:
+        os.replace(tmp_dir, entry_dir)
+    except OSError:
+        shutil.rmtree(tmp_dir, ignore_errors=True) # Written meanwhile by another run
+    logging.info(f'Cached parsed source ({entry_dir.name}).')
+
+    entries = sorted((d for d in entry_dir.parent.iterdir() if d.is_dir() and '.tmp' not in d.name),
+                     key=lambda d: d.stat().st_mtime, reverse=True)
+    for old_entry in entries[MAX_CACHE_ENTRIES:]:
+        shutil.rmtree(old_entry, ignore_errors=True)